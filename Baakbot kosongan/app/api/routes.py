@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional
 from ..models.schemas import ChatRequest, ChatResponse, SessionClearRequest
 from ..services.rag_ingestion import rag_ingestion_service
 from ..services.database import db_service
 from ..services.intent_classifier import intent_classifier, IntentType
-from ..services.llm_service import llm_service
-from ..services.memory_manager import memory_manager
+from ..services.llm_service import llm_service, LLM_ERROR_MESSAGE
+from ..services.answer_cache import answer_cache
+from ..services.memory_manager import SessionHandle, memory_manager
 from ..utils.helpers import formatter
-import logging,re
+from ..config import settings
+import json,logging,re
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -20,6 +22,11 @@ LINK_LINE_RE = re.compile(
     re.I | re.M
 )
 
+DAFTAR_MK_KEYS = ["daftar_mk_index", "daftar_mk"]
+# top_k untuk query ber-filter doc_key: filter sudah membatasi hasil ke dokumen yang dituju,
+# jadi dibuat longgar supaya dokumen panjang (banyak chunk) tidak terpotong diam-diam
+FILTERED_TOP_K = 100
+
 def _shape(session_id: str, *, answer: str, source: str, intent, has_data: bool) -> dict:
     # intent bisa Enum atau string, ubah ke string
     intent_str = intent.value if hasattr(intent, "value") else str(intent)
@@ -36,18 +43,15 @@ async def _collect_daftar_mk_from_kb() -> list[dict]:
     Ambil semua bullet link 'Daftar Mata Kuliah' dari vector store.
     Tidak butuh file lokal.
     """
-    # Kalau llm_service mendukung filter metadata, pakai ini:
-    try:
-        docs = await llm_service.search_knowledge_base(
-            "daftar mata kuliah",
-            top_k=100,
-            min_score=0.05,
-            # kalau ada dukungan filter, aktifkan salah satu:
-            # metadata_filter={"doc_key": {"$in": ["daftar_mk", "daftar_mk_index"]}},
-            include_text=True  # kalau API-mu ada flag ini
-        )
-    except TypeError:
-        # fallback signature lama
+    # filter doc_key dijalankan di vector store → hanya chunk daftar MK yang diambil
+    docs = await llm_service.search_knowledge_base(
+        "daftar mata kuliah",
+        top_k=FILTERED_TOP_K,
+        min_score=0.0,
+        metadata_filter={"doc_key": {"$in": DAFTAR_MK_KEYS}},
+    )
+    if not docs:
+        # index lama (belum ada doc_key di metadata) → query luas seperti sebelumnya
         docs = await llm_service.search_knowledge_base("daftar mata kuliah", top_k=100, min_score=0.05)
 
     texts = []
@@ -55,7 +59,7 @@ async def _collect_daftar_mk_from_kb() -> list[dict]:
         meta = d.get("metadata", {})
         title   = (d.get("title") or meta.get("title") or "")
         section = (d.get("section") or meta.get("section") or "")
-        doc_key = (meta.get("doc_key") or "")
+        doc_key = (d.get("doc_key") or meta.get("doc_key") or "")
         text    = d.get("content") or d.get("text") or meta.get("text") or ""
         if not text:
             continue
@@ -101,40 +105,27 @@ async def handle_chat(request: ChatRequest):
     4. Memory management
     5. Return structured response
     """
+    session: Optional[SessionHandle] = None
     try:
-        # 1. Session Management
-        session = memory_manager.get_session(request.session_id)
-        if not session:
-            session_id = memory_manager.create_session()
-            logger.info(f"Created new session: {session_id}")
-        else:
-            session_id = request.session_id
-            memory_manager.update_session_activity(session_id)
+        # 1. Session Management (satu lookup; disimpan sekali di akhir request)
+        session = await _resolve_session(request.session_id)
         
         user_question = request.question.strip()
         
         # 2. Check for pending clarification
-        pending = memory_manager.get_pending_clarification(session_id)
+        pending = session.get_pending_clarification()
         if pending:
-            return await _handle_clarification_response(user_question, session_id, pending)
+            return await _handle_clarification_response(user_question, session, pending)
         
         # 3. Intent Classification
         intent_type, parameters = intent_classifier.classify_intent(user_question)
         logger.info(f"[chat] q={user_question!r} intent={intent_type} params={parameters}")
         
         # 4. Route to appropriate handler
-        if intent_type == IntentType.NEED_CLARIFICATION:
-            response_data = await _handle_clarification_request(user_question, session_id, parameters)
-        elif intent_type == IntentType.LLM_FALLBACK:
-            response_data = await _handle_llm_query(user_question, session_id)
-        elif intent_type in (IntentType.INFO_JADWAL_KULIAH, IntentType.CARA_BACA_JADWAL):   # NEW
-            response_data = await _handle_info_intent(intent_type, user_question, session_id) # NEW
-        else:
-            response_data = await _handle_rule_based_query(intent_type, parameters, session_id)
+        response_data = await _route_intent(intent_type, parameters, user_question, session)
         
         # 5. Update conversation memory
-        memory_manager.add_exchange(
-            session_id, 
+        session.add_exchange(
             user_question, 
             response_data['answer'], 
             intent_type.value,
@@ -146,10 +137,10 @@ async def handle_chat(request: ChatRequest):
             answer=response_data['answer'],
             source=response_data.get('source', 'system'),
             intent=intent_type.value,
-            session_id=session_id,
+            session_id=session.id,
             has_data=response_data.get('has_data', False)
         )
-        logger.info(f"[chat] session={session_id} source={resp.source} has_data={resp.has_data} ans_len={len(resp.answer or '')}")
+        logger.info(f"[chat] session={session.id} source={resp.source} has_data={resp.has_data} ans_len={len(resp.answer or '')}")
         return resp
         
     except Exception as e:
@@ -158,54 +149,156 @@ async def handle_chat(request: ChatRequest):
             answer=formatter.format_error_message('system_error'),
             source="error",
             intent="error",
-            session_id=request.session_id or memory_manager.create_session(),
+            session_id=session.id if session else (
+                request.session_id or await memory_manager.run(memory_manager.create_session)
+            ),
             has_data=False
         )
+    finally:
+        if session:
+            await session.commit()
+
+async def _resolve_session(session_id: Optional[str]) -> SessionHandle:
+    """Pakai sesi yang masih aktif, atau buat sesi baru (handle; commit() di akhir request)."""
+    session = await memory_manager.open_session(session_id)
+    if session.created:
+        logger.info(f"Created new session: {session.id}")
+    return session
+
+async def _route_intent(intent_type: IntentType, parameters: dict, user_question: str, session: SessionHandle) -> dict:
+    if intent_type == IntentType.NEED_CLARIFICATION:
+        return await _handle_clarification_request(user_question, session, parameters)
+    elif intent_type == IntentType.LLM_FALLBACK:
+        return await _handle_llm_query(user_question, session)
+    elif intent_type in (IntentType.INFO_JADWAL_KULIAH, IntentType.CARA_BACA_JADWAL):   # NEW
+        return await _handle_info_intent(intent_type, user_question, session) # NEW
+    return await _handle_rule_based_query(intent_type, parameters, session)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/api/chat/stream")
+async def handle_chat_stream(request: ChatRequest):
+    """
+    Varian streaming dari /api/chat (Server-Sent Events).
+    - event: meta  → {session_id, intent, source} segera setelah retrieval selesai
+    - event: token → {delta} potongan jawaban LLM begitu diterima (LLM fallback & info intent)
+    - event: done  → payload lengkap seperti ChatResponse (jawaban final + footer sumber)
+    Intent database/klarifikasi tidak di-stream: langsung satu event done.
+    """
+    try:
+        session = await _resolve_session(request.session_id)
+    except Exception as e:
+        logger.error(f"Error resolving session for stream: {e}")
+        session = await memory_manager.open_session(None)
+    user_question = request.question.strip()
 
-async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, session_id: str) -> dict:
+    async def events():
+        try:
+            pending = session.get_pending_clarification()
+            if pending:
+                resp = await _handle_clarification_response(user_question, session, pending)
+                yield _sse("done", resp.model_dump())
+                return
+
+            intent_type, parameters = intent_classifier.classify_intent(user_question)
+            logger.info(f"[chat/stream] q={user_question!r} intent={intent_type} params={parameters}")
+
+            if intent_type == IntentType.LLM_FALLBACK:
+                plan = await _prepare_llm_query(user_question, session)
+            elif intent_type in (IntentType.INFO_JADWAL_KULIAH, IntentType.CARA_BACA_JADWAL):
+                plan = await _prepare_info_intent(intent_type, user_question, session)
+            else:
+                plan = {"response": await _route_intent(intent_type, parameters, user_question, session)}
+
+            if "response" in plan:
+                response_data = plan["response"]
+            else:
+                yield _sse("meta", {
+                    "session_id": session.id,
+                    "intent": intent_type.value,
+                    "source": plan["result"].get("source", "llm_rag"),
+                })
+                parts = []
+                async for delta in llm_service.stream_response(**plan["generate"]):
+                    parts.append(delta)
+                    yield _sse("token", {"delta": delta})
+                answer = "".join(parts).strip()
+                response_data = _finish_generation(plan, answer)
+                footer = response_data["answer"][len(answer):]
+                if footer:
+                    yield _sse("token", {"delta": footer})
+
+            session.add_exchange(user_question, response_data["answer"], intent_type.value, parameters)
+            resp = ChatResponse(
+                answer=response_data["answer"],
+                source=response_data.get("source", "system"),
+                intent=intent_type.value,
+                session_id=session.id,
+                has_data=response_data.get("has_data", False),
+            )
+            logger.info(f"[chat/stream] session={session.id} source={resp.source} has_data={resp.has_data} ans_len={len(resp.answer or '')}")
+            yield _sse("done", resp.model_dump())
+        except Exception as e:
+            logger.error(f"Error in chat stream handler: {e}")
+            yield _sse("done", ChatResponse(
+                answer=formatter.format_error_message('system_error'),
+                source="error",
+                intent="error",
+                session_id=session.id,
+                has_data=False
+            ).model_dump())
+        finally:
+            await session.commit()  # juga saat client putus di tengah stream
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, session: SessionHandle) -> dict:
     try:
         if intent_type == IntentType.JADWAL_KULIAH:
             kelas = (parameters.get('kelas') or "").upper()
             data = await db_service.get_jadwal_kuliah_by_kelas(kelas)
             if not data:
-                # hitung saran berdasarkan prefix
-                m = re.match(r"^([1-6][A-Za-z]{2,3})", kelas)
-                if m:
-                    prefix = m.group(1).upper()
-                    stats = await db_service.get_kelas_prefix_stats(prefix)
+                # hitung saran berdasarkan prefix (ikut di-cache bersama "kelas tidak ditemukan")
+                hint = await db_service.missing_kelas_hint("jadwal_kuliah", kelas)
+                if hint:
+                    prefix, stats = hint["prefix"], hint["stats"]
                     if stats["exists"]:
                         rng = f"{prefix}{stats['min']:02d}–{prefix}{stats['max']:02d}"
                         hint = (f"❌ Kelas <b>{kelas}</b> tidak ditemukan.\n"
                                 f"Untuk prefix <b>{prefix}</b>, tersedia: <b>{rng}</b>.")
-                        return _shape(session_id, answer=hint, source="database",
+                        return _shape(session.id, answer=hint, source="database",
                                     intent=IntentType.JADWAL_KULIAH, has_data=False)
             html = formatter.format_jadwal_kuliah_html(data, kelas=kelas)
-            return _shape(session_id, answer=html, source="database",
+            return _shape(session.id, answer=html, source="database",
                         intent=IntentType.JADWAL_KULIAH, has_data=len(data) > 0)
 
         elif intent_type == IntentType.JADWAL_UAS:
             kelas = (parameters.get('kelas') or "").upper()
             data = await db_service.get_jadwal_uas_by_kelas(kelas)
             if not data:
-                m = re.match(r"^([1-6][A-Za-z]{2,3})", kelas)
-                if m:
-                    prefix = m.group(1).upper()
-                    stats = await db_service.get_kelas_prefix_stats(prefix)
+                hint = await db_service.missing_kelas_hint("jadwal_uas", kelas)
+                if hint:
+                    prefix, stats = hint["prefix"], hint["stats"]
                     if stats["exists"]:
                         rng = f"{prefix}{stats['min']:02d}–{prefix}{stats['max']:02d}"
                         hint = (f"❌ Jadwal UAS untuk kelas <b>{kelas}</b> tidak ditemukan.<br>"
                                 f"Untuk prefix <b>{prefix}</b>, tersedia: <b>{rng}</b>.")
-                        return _shape(session_id, answer=hint, source="database",
+                        return _shape(session.id, answer=hint, source="database",
                                     intent=IntentType.JADWAL_UAS, has_data=False)
             html = formatter.format_jadwal_uas_html(data, kelas)
-            return _shape(session_id, answer=html, source="database",
+            return _shape(session.id, answer=html, source="database",
                         intent=IntentType.JADWAL_UAS, has_data=len(data) > 0)
 
         elif intent_type == IntentType.JADWAL_DOSEN:
             dosen = parameters.get('dosen')
             data = await db_service.get_jadwal_kuliah_by_dosen(dosen)
             html = formatter.format_jadwal_dosen_html(data, dosen=dosen)
-            return _shape(session_id,
+            return _shape(session.id,
                         answer=html,
                         source="database",
                         intent=IntentType.JADWAL_DOSEN,
@@ -215,7 +308,7 @@ async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, se
             kelas = parameters.get('kelas')
             data = await db_service.get_wali_kelas_by_kelas(kelas)
             txt = formatter.format_wali_kelas(data, kelas)
-            return _shape(session_id,
+            return _shape(session.id,
                         answer=txt,
                         source="database",
                         intent=IntentType.WALI_KELAS,
@@ -224,7 +317,7 @@ async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, se
         elif intent_type == IntentType.JADWAL_LOKET:
             data = await db_service.get_jadwal_loket()
             html = formatter.format_jadwal_loket_html(data)   # <-- pakai HTML
-            return _shape(session_id,
+            return _shape(session.id,
                         answer=html,
                         source="database",
                         intent=IntentType.JADWAL_LOKET,
@@ -237,7 +330,7 @@ async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, se
             data  = await db_service.get_kalender_akademik(term=term, group=group)
             html  = formatter.format_kalender_akademik_html(data, term=term, group=group)
             logger.info(f"[kalender] term={term} group={group} rows={len(data)}")
-            return _shape(session_id,
+            return _shape(session.id,
                         answer=html,
                         source="database",
                         intent=IntentType.KALENDER_AKADEMIK,
@@ -246,14 +339,14 @@ async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, se
         elif intent_type == IntentType.DAFTAR_MATA_KULIAH:
             items = await _collect_daftar_mk_from_kb()
             html  = formatter.format_daftar_mata_kuliah_html(items)
-            return _shape(session_id,
+            return _shape(session.id,
                         answer=html,
                         source="llm_rag",   # sumber tetap KB, tapi tanpa generasi LLM
                         intent=IntentType.DAFTAR_MATA_KULIAH,
                         has_data=len(items) > 0)
             
         # fallback salah intent
-        return _shape(session_id,
+        return _shape(session.id,
                     answer=formatter.format_error_message('invalid_format'),
                     source="error",
                     intent="error",
@@ -261,17 +354,17 @@ async def _handle_rule_based_query(intent_type: IntentType, parameters: dict, se
 
     except Exception as e:
         logger.error(f"Error in rule-based query: {e}")
-        return _shape(session_id,
+        return _shape(session.id,
                     answer=formatter.format_error_message('system_error'),
                     source="error",
                     intent="error",
                     has_data=False)
 
-async def _handle_clarification_request(user_question: str, session_id: str, parameters: dict) -> dict:
+async def _handle_clarification_request(user_question: str, session: SessionHandle, parameters: dict) -> dict:
     # A) Ambigu jenis jadwal (sudah ada)
     if parameters.get("ask") == "jenis_jadwal" and parameters.get("kelas"):
         kelas = parameters["kelas"].upper()
-        memory_manager.set_pending_clarification(session_id, "jadwal_ambiguous", {"kelas": kelas})
+        session.set_pending_clarification("jadwal_ambiguous", {"kelas": kelas})
         return {
             "answer": (
                 f"Untuk kelas <b>{kelas}</b>, mau lihat <b>jadwal kuliah</b> atau <b>jadwal UAS</b>?<br>"
@@ -279,14 +372,14 @@ async def _handle_clarification_request(user_question: str, session_id: str, par
             ),
             "source": "clarification",
             "intent": "need_clarification",
-            "session_id": session_id,
+            "session_id": session.id,
             "has_data": False
         }
     # B) Prefix-only atau format salah → tampilkan rentang yang tersedia berdasar DB
     if parameters.get("ask") == "kelas_range" and parameters.get("prefix"):
         prefix = parameters["prefix"].upper()
         stats = await db_service.get_kelas_prefix_stats(prefix)
-        memory_manager.set_pending_clarification(session_id, "kelas_range", {"prefix": prefix})
+        session.set_pending_clarification("kelas_range", {"prefix": prefix})
         if not stats["exists"]:
             msg = (
                 f"Tidak menemukan kelas dengan prefix <b>{prefix}</b> di database saat ini. "
@@ -306,20 +399,20 @@ async def _handle_clarification_request(user_question: str, session_id: str, par
             "answer": msg,
             "source": "clarification",
             "intent": "need_clarification",
-            "session_id": session_id,
+            "session_id": session.id,
             "has_data": False
         }
     # C) Cabang generik (jangan dihapus): untuk intent lain yg butuh param
     missing_param = parameters.get("missing")
     intended_intent = parameters.get("intent")
     if missing_param and intended_intent:
-        memory_manager.set_pending_clarification(session_id, str(intended_intent), parameters)
+        session.set_pending_clarification(str(intended_intent), parameters)
         answer = formatter.format_clarification_request(missing_param, str(intended_intent))
         return {
             "answer": answer,
             "source": "clarification",
             "intent": "need_clarification",
-            "session_id": session_id,
+            "session_id": session.id,
             "has_data": False
         }
 
@@ -328,45 +421,45 @@ async def _handle_clarification_request(user_question: str, session_id: str, par
         "answer": formatter.format_error_message("invalid_format"),
         "source": "error",
         "intent": "error",
-        "session_id": session_id,
+        "session_id": session.id,
         "has_data": False
     }
     
-async def _handle_clarification_response(user_question: str, session_id: str, pending: tuple) -> ChatResponse:
+async def _handle_clarification_response(user_question: str, session: SessionHandle, pending: tuple) -> ChatResponse:
     # --- EARLY OVERRIDE: jika user kirim query baru yang valid, gantikan alur pending lama ---
     new_intent, new_params = intent_classifier.classify_intent(user_question or "")
     # --- EARLY OVERRIDE untuk query edukatif saat sedang pending  ---
     if new_intent in (IntentType.INFO_JADWAL_KULIAH, IntentType.CARA_BACA_JADWAL):
-        memory_manager.clear_pending_clarification(session_id)
-        resp = await _handle_info_intent(new_intent, user_question, session_id)
+        session.clear_pending_clarification()
+        resp = await _handle_info_intent(new_intent, user_question, session)
         return ChatResponse(
             answer=resp["answer"], source=resp["source"],
             intent=(new_intent.value if hasattr(new_intent, "value") else str(new_intent)),
-            session_id=session_id, has_data=resp["has_data"]
+            session_id=session.id, has_data=resp["has_data"]
         )
     # 1) Sudah intent final (langsung eksekusi)
     if new_intent in (IntentType.JADWAL_KULIAH, IntentType.JADWAL_UAS):
-        memory_manager.clear_pending_clarification(session_id)
-        resp = await _handle_rule_based_query(new_intent, new_params, session_id)
+        session.clear_pending_clarification()
+        resp = await _handle_rule_based_query(new_intent, new_params, session)
         return ChatResponse(answer=resp["answer"], source=resp["source"],
-                            intent=new_intent.value, session_id=session_id,
+                            intent=new_intent.value, session_id=session.id,
                             has_data=resp["has_data"])
 
     # 2) Prefix-only / bare-class (tetap di alur klarifikasi yg tepat)
     if new_intent == IntentType.NEED_CLARIFICATION and new_params.get("ask") == "kelas_range":
-        memory_manager.clear_pending_clarification(session_id)
-        resp = await _handle_clarification_request(user_question, session_id, new_params)
+        session.clear_pending_clarification()
+        resp = await _handle_clarification_request(user_question, session, new_params)
         return ChatResponse(answer=resp["answer"], source=resp["source"],
-                            intent="need_clarification", session_id=session_id, has_data=False)
+                            intent="need_clarification", session_id=session.id, has_data=False)
     if new_intent == IntentType.NEED_CLARIFICATION and new_params.get("ask") == "jenis_jadwal" and new_params.get("kelas"):
-        memory_manager.clear_pending_clarification(session_id)
-        resp = await _handle_clarification_request(user_question, session_id, {"ask":"jenis_jadwal","kelas":new_params["kelas"]})
+        session.clear_pending_clarification()
+        resp = await _handle_clarification_request(user_question, session, {"ask":"jenis_jadwal","kelas":new_params["kelas"]})
         return ChatResponse(answer=resp["answer"], source=resp["source"],
-                            intent="need_clarification", session_id=session_id, has_data=False)
+                            intent="need_clarification", session_id=session.id, has_data=False)
 
     # 3) Intent RULE-BASED lain → keluar dari pending & rute sesuai intent
     if new_intent in (IntentType.KALENDER_AKADEMIK, IntentType.JADWAL_LOKET, IntentType.WALI_KELAS, IntentType.JADWAL_DOSEN):
-        memory_manager.clear_pending_clarification(session_id)
+        session.clear_pending_clarification()
         # jika butuh param dan belum ada → minta klarifikasi param tsb
         need = None
         if new_intent == IntentType.WALI_KELAS and not new_params.get("kelas"): need = "kelas"
@@ -374,18 +467,18 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
         if need:
             ans = formatter.format_clarification_request(need, new_intent.value)
             return ChatResponse(answer=ans, source="clarification", intent="need_clarification",
-                                session_id=session_id, has_data=False)
-        resp = await _handle_rule_based_query(new_intent, new_params, session_id)
+                                session_id=session.id, has_data=False)
+        resp = await _handle_rule_based_query(new_intent, new_params, session)
         return ChatResponse(answer=resp["answer"], source=resp["source"],
-                            intent=new_intent.value, session_id=session_id,
+                            intent=new_intent.value, session_id=session.id,
                             has_data=resp["has_data"])
 
     # 4) LLM fallback / daftar-mk / prosedur → keluar dari pending & ke LLM
     if new_intent in (IntentType.DAFTAR_MATA_KULIAH, IntentType.LLM_FALLBACK):
-        memory_manager.clear_pending_clarification(session_id)
-        resp = await _handle_llm_query(user_question, session_id)
+        session.clear_pending_clarification()
+        resp = await _handle_llm_query(user_question, session)
         return ChatResponse(answer=resp["answer"], source=resp["source"],
-                           intent="llm_fallback", session_id=session_id,
+                           intent="llm_fallback", session_id=session.id,
                            has_data=resp["has_data"])
 
     # ---------- Lanjut alur pending lama ----------
@@ -399,11 +492,11 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
         if det:
             itype = IntentType.JADWAL_UAS if "uas" in low else IntentType.JADWAL_KULIAH
             kelas = det["base"] if itype == IntentType.JADWAL_UAS else det["full"]
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(itype, {"kelas": kelas}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(itype, {"kelas": kelas}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=itype.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
 
         # Belum lengkap → ulangi dengan prefix sebelumnya
@@ -417,7 +510,7 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
             msg += f"Misal: <code>jadwal kuliah {prefix}01</code>."
         return ChatResponse(
             answer=msg, source="clarification", intent="need_clarification",
-            session_id=session_id, has_data=False
+            session_id=session.id, has_data=False
         )
 
     # 2) Izinkan user mengganti pilihan (kuliah ⇄ UAS) meski pending intent beda
@@ -426,19 +519,19 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
         det = intent_classifier.extract_kelas_detail(user_question or "")
         if det:
             kelas = det["base"] if target_intent == IntentType.JADWAL_UAS else det["full"]
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(target_intent, {"kelas": kelas}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(target_intent, {"kelas": kelas}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=target_intent.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
 
         # Tidak ada kelas → minta kelas untuk intent baru (UAS/Kuliah)
-        memory_manager.set_pending_clarification(session_id, target_intent.value, {})
+        session.set_pending_clarification(target_intent.value, {})
         msg = formatter.format_clarification_request("kelas", target_intent.value)
         return ChatResponse(
             answer=msg, source="clarification", intent="need_clarification",
-            session_id=session_id, has_data=False
+            session_id=session.id, has_data=False
         )
 
     # 3) Pending: jadwal_ambiguous (punya {kelas} sebelumnya)
@@ -446,34 +539,34 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
         kelas = (payload.get("kelas") or "").upper()
 
         if "uas" in low:
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, {"kelas": kelas}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, {"kelas": kelas}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=IntentType.JADWAL_UAS.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
         if "kuliah" in low:
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, {"kelas": kelas}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, {"kelas": kelas}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=IntentType.JADWAL_KULIAH.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
 
         det = intent_classifier.extract_kelas_detail(user_question or "")
         if "uas" in low and det:
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, {"kelas": det["base"]}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, {"kelas": det["base"]}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=IntentType.JADWAL_UAS.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
         if "kuliah" in low and det:
-            memory_manager.clear_pending_clarification(session_id)
-            resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, {"kelas": det["full"]}, session_id)
+            session.clear_pending_clarification()
+            resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, {"kelas": det["full"]}, session)
             return ChatResponse(
                 answer=resp["answer"], source=resp["source"], intent=IntentType.JADWAL_KULIAH.value,
-                session_id=session_id, has_data=resp["has_data"]
+                session_id=session.id, has_data=resp["has_data"]
             )
 
         # Masih ambigu
@@ -481,29 +574,29 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
                f"atau <code>jadwal uas {kelas}</code> 🙂")
         return ChatResponse(
             answer=msg, source="clarification", intent="need_clarification",
-            session_id=session_id, has_data=False
+            session_id=session.id, has_data=False
         )
 
     # 4) Fallback: klasifikasi lagi dan rute sesuai pending intent lama
     intent_type, new_parameters = intent_classifier.classify_intent(user_question)
-    memory_manager.clear_pending_clarification(session_id)
+    session.clear_pending_clarification()
 
     if pending_intent == 'jadwal_kuliah' and new_parameters.get('kelas'):
-        resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, new_parameters, session_id)
+        resp = await _handle_rule_based_query(IntentType.JADWAL_KULIAH, new_parameters, session)
         final_intent = IntentType.JADWAL_KULIAH.value
     elif pending_intent == 'jadwal_uas' and new_parameters.get('kelas'):
-        resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, new_parameters, session_id)
+        resp = await _handle_rule_based_query(IntentType.JADWAL_UAS, new_parameters, session)
         final_intent = IntentType.JADWAL_UAS.value
     elif pending_intent == 'wali_kelas' and new_parameters.get('kelas'):
-        resp = await _handle_rule_based_query(IntentType.WALI_KELAS, new_parameters, session_id)
+        resp = await _handle_rule_based_query(IntentType.WALI_KELAS, new_parameters, session)
         final_intent = IntentType.WALI_KELAS.value
     elif pending_intent == 'jadwal_dosen' and new_parameters.get('dosen'):
-        resp = await _handle_rule_based_query(IntentType.JADWAL_DOSEN, new_parameters, session_id)
+        resp = await _handle_rule_based_query(IntentType.JADWAL_DOSEN, new_parameters, session)
         final_intent = IntentType.JADWAL_DOSEN.value
     elif pending_intent == 'kalender_akademik':
         term = new_parameters.get('term')
         params = {'term': term} if term else {}
-        resp = await _handle_rule_based_query(IntentType.KALENDER_AKADEMIK, params, session_id)
+        resp = await _handle_rule_based_query(IntentType.KALENDER_AKADEMIK, params, session)
         final_intent = IntentType.KALENDER_AKADEMIK.value
     else:
         resp = {
@@ -513,77 +606,111 @@ async def _handle_clarification_response(user_question: str, session_id: str, pe
         }
         final_intent = "error"
 
-    memory_manager.add_exchange(session_id, user_question, resp["answer"], pending_intent, new_parameters)
+    session.add_exchange(user_question, resp["answer"], pending_intent, new_parameters)
 
     return ChatResponse(
         answer=resp["answer"],
         source=resp["source"],
         intent=final_intent,
-        session_id=session_id,
+        session_id=session.id,
         has_data=resp["has_data"]
     )
 
-async def _handle_llm_query(user_question: str, session_id: str) -> dict:
+async def _handle_llm_query(user_question: str, session: SessionHandle) -> dict:
+    plan = await _prepare_llm_query(user_question, session)
+    if "response" in plan:
+        return plan["response"]
+    answer = await llm_service.generate_response(**plan["generate"])
+    return _finish_generation(plan, answer)
+
+def _finish_generation(plan: dict, answer: str) -> dict:
+    """Gabungkan jawaban LLM (utuh atau hasil stream) dengan footer sumber KB."""
+    failed = LLM_ERROR_MESSAGE in answer
+    sources_note = formatter.format_sources(plan["docs"])
+    if sources_note:
+        answer = f"{answer}\n\n{sources_note}"
+    result = {**plan["result"], "answer": answer}
+
+    cache = plan.get("cache")
+    if cache and answer_cache and not failed:
+        try:
+            answer_cache.put(payload=result, **cache)
+        except Exception as e:
+            logger.warning(f"Answer cache write failed: {e}")
+    return result
+
+async def _prepare_llm_query(user_question: str, session: SessionHandle) -> dict:
+    """
+    Tahap sebelum generasi untuk LLM fallback (guard, klarifikasi, retrieval KB).
+    Return {"response": {...}} bila jawaban sudah final, atau
+    {"generate": kwargs generate/stream_response, "docs": kb, "result": field respons}.
+    """
     low = (user_question or "").lower().strip()
 
     # 0) KHUSUS: "daftar mata kuliah" → guard + strict extractive
     if any(k in low for k in ("daftar mata kuliah", "list mata kuliah", "daftar mk")):
         try:
-            # kalau llm_service.search_knowledge_base sudah kamu tambah argumen prefer_doc_key, pakai;
-            # kalau belum, hapus argumen itu saja.
             kb = await llm_service.search_knowledge_base(
                 "daftar mata kuliah",
-                top_k=30,
-                min_score=0.30,
-                prefer_doc_key=["daftar_mk_index", "daftar_mk"]
+                top_k=FILTERED_TOP_K,
+                min_score=0.0,
+                prefer_doc_key=DAFTAR_MK_KEYS,
+                metadata_filter={"doc_key": {"$in": DAFTAR_MK_KEYS}},
             )
             if not kb:
-                return {
+                kb = await llm_service.search_knowledge_base(
+                    "daftar mata kuliah",
+                    top_k=30,
+                    min_score=0.30,
+                    prefer_doc_key=DAFTAR_MK_KEYS
+                )
+            if not kb:
+                return {"response": {
                     "answer": "Maaf, data 'Daftar Mata Kuliah' belum tersedia di basis pengetahuan.",
                     "source": "llm_rag",
                     "has_data": False
-                }
+                }}
 
-            answer = await llm_service.generate_response(
-                user_query="Tampilkan *seluruh* daftar mata kuliah sebagai daftar link markdown tanpa memotong.",
-                conversation_context=None,
-                knowledge_context=kb,
-                strict=True,   # wajib agar tidak terpotong/di-parafrase
-            )
-            sources_note = formatter.format_sources(kb)
-            if sources_note:
-                answer = f"{answer}\n\n{sources_note}"
-            return {"answer": answer, "source": "llm_rag", "has_data": True}
+            return {
+                "generate": dict(
+                    user_query="Tampilkan *seluruh* daftar mata kuliah sebagai daftar link markdown tanpa memotong.",
+                    conversation_context=None,
+                    knowledge_context=kb,
+                    strict=True,   # wajib agar tidak terpotong/di-parafrase
+                ),
+                "docs": kb,
+                "result": {"source": "llm_rag", "has_data": True},
+            }
 
         except Exception as e:
             logger.error(f"Error daftar mata kuliah flow: {e}")
-            return {
+            return {"response": {
                 "answer": "Maaf, terjadi kendala saat memuat daftar mata kuliah.",
                 "source": "llm_error",
                 "has_data": False
-            }
+            }}
 
     # 1) FAILSAFE: user menyebut kode kelas lengkap → minta pilih kuliah/UAS
     det = intent_classifier.extract_kelas_detail(user_question or "")
     if det:
         kelas = det["full"]  # kuliah boleh bawa suffix
-        memory_manager.set_pending_clarification(session_id, "jadwal_ambiguous", {"kelas": kelas})
-        return {
+        session.set_pending_clarification("jadwal_ambiguous", {"kelas": kelas})
+        return {"response": {
             "answer": (
                 f"Untuk kelas <b>{kelas}</b>, mau lihat <b>jadwal kuliah</b> atau <b>jadwal UAS</b>?<br>"
                 f"Contoh cepat: <code>jadwal kuliah {kelas}</code> atau <code>jadwal uas {kelas}</code>"
             ),
             "source": "clarification",
             "intent": "need_clarification",
-            "session_id": session_id,
+            "session_id": session.id,
             "has_data": False
-        }
+        }}
 
     # 2) FAILSAFE: prefix saja (mis. 4KA / 4KB) → tampilkan rentang yang tersedia
     m_pref = intent_classifier.RE_CLASS_PREFIX_ONLY.fullmatch(user_question or "")
     if m_pref:
         prefix = (m_pref.group("lvl") + m_pref.group("prodi")).upper()
-        memory_manager.set_pending_clarification(session_id, "kelas_range", {"prefix": prefix})
+        session.set_pending_clarification("kelas_range", {"prefix": prefix})
         stats = await db_service.get_kelas_prefix_stats(prefix)
         if not stats["exists"]:
             msg = f"Tidak menemukan kelas dengan prefix <b>{prefix}</b> di database saat ini."
@@ -595,41 +722,70 @@ async def _handle_llm_query(user_question: str, session_id: str) -> dict:
                 f"Tulis lengkap salah satu, contoh: "
                 f"<code>jadwal kuliah {prefix}{stats['min']:02d}</code> atau "
                 f"<code>jadwal uas {prefix}{stats['max']:02d}</code>.")
-        return {
+        return {"response": {
             "answer": msg,
             "source": "clarification",
             "intent": "need_clarification",
-            "session_id": session_id,
+            "session_id": session.id,
             "has_data": False
-        }
+        }}
 
-    # 3) RAG umum
+    # 3) RAG umum (answer cache: exact → retrieval → semantik → generate)
     try:
-        knowledge_docs = await llm_service.search_knowledge_base(user_question, top_k=5, min_score=0.45)
-        answer = await llm_service.generate_response(
-            user_query=user_question,
-            conversation_context=None,
-            knowledge_context=knowledge_docs,
-            strict=(len(knowledge_docs) > 0),
+        kb_version = rag_ingestion_service.kb_version()
+        if answer_cache:
+            hit = answer_cache.get_exact(user_question, kb_version)
+            if hit:
+                return {"response": hit}
+
+        query_embedding = await llm_service.create_embedding(user_question)
+        knowledge_docs = await llm_service.search_knowledge_base(
+            user_question, top_k=5, min_score=0.45, query_embedding=query_embedding
         )
-        sources_note = formatter.format_sources(knowledge_docs)
-        if sources_note:
-            answer = f"{answer}\n\n{sources_note}"
-        return {'answer': answer, 'source': 'llm_rag', 'has_data': len(knowledge_docs) > 0}
+        chunk_ids = [d.get("id") for d in knowledge_docs]
+
+        cache = None
+        if answer_cache and knowledge_docs:
+            hit = answer_cache.get_similar(query_embedding, chunk_ids, kb_version)
+            if hit:
+                return {"response": hit}
+            # hanya jawaban yang bersumber dari KB (strict, deterministik) yang di-cache
+            cache = {"question": user_question, "kb_version": kb_version,
+                     "embedding": query_embedding, "chunk_ids": chunk_ids}
+
+        return {
+            "generate": dict(
+                user_query=user_question,
+                conversation_context=None,
+                knowledge_context=knowledge_docs,
+                strict=(len(knowledge_docs) > 0),
+            ),
+            "docs": knowledge_docs,
+            "result": {'source': 'llm_rag', 'has_data': len(knowledge_docs) > 0},
+            "cache": cache,
+        }
     except Exception as e:
         logger.error(f"Error in LLM query: {e}")
-        return {
+        return {"response": {
             'answer': "🤖 Maaf, saya sedang mengalami kendala teknis. Untuk informasi prosedur akademik, silakan hubungi BAAK langsung.",
             'source': 'llm_error',
             'has_data': False
-        }
+        }}
 
-async def _handle_info_intent(intent_type: IntentType, user_question: str, session_id: str) -> dict:
+async def _handle_info_intent(intent_type: IntentType, user_question: str, session: SessionHandle) -> dict:
     """
     Jawaban edukatif/penjelasan dari KB (STRICT), tidak meminta kelas.
     - INFO_JADWAL_KULIAH → definisi + (opsional) waktu kuliah
     - CARA_BACA_JADWAL   → cara membaca + (opsional) waktu kuliah
     """
+    plan = await _prepare_info_intent(intent_type, user_question, session)
+    if "response" in plan:
+        return plan["response"]
+    answer = await llm_service.generate_response(**plan["generate"])
+    return _finish_generation(plan, answer)
+
+async def _prepare_info_intent(intent_type: IntentType, user_question: str, session: SessionHandle) -> dict:
+    """Retrieval KB untuk info intent; format return sama dengan _prepare_llm_query."""
     try:
         if intent_type == IntentType.CARA_BACA_JADWAL:
             prefer = ["cara_baca_jadwal", "waktu_kuliah"]
@@ -640,40 +796,49 @@ async def _handle_info_intent(intent_type: IntentType, user_question: str, sessi
 
         kb = await llm_service.search_knowledge_base(
             user_question or title,
-            top_k=20,
-            min_score=0.30,
-            prefer_doc_key=prefer
+            top_k=8,
+            min_score=0.0,
+            prefer_doc_key=prefer,
+            metadata_filter={"doc_key": {"$in": prefer}},
         )
+        if not kb:
+            # index lama tanpa doc_key → query luas + re-rank
+            kb = await llm_service.search_knowledge_base(
+                user_question or title,
+                top_k=20,
+                min_score=0.30,
+                prefer_doc_key=prefer
+            )
 
-        answer = await llm_service.generate_response(
-            user_query=user_question or title,
-            conversation_context=None,
-            knowledge_context=kb,
-            strict=True,  # pastikan mengutip dari KB saja
-        )
-
-        sources_note = formatter.format_sources(kb)
-        if sources_note:
-            answer = f"{answer}\n\n{sources_note}"
-
-        return _shape(session_id,
-                        answer=answer,
+        result = _shape(session.id,
+                        answer="",
                         source="llm_rag",
                         intent=intent_type,
                         has_data=len(kb) > 0)
+        result.pop("answer")
+        return {
+            "generate": dict(
+                user_query=user_question or title,
+                conversation_context=None,
+                knowledge_context=kb,
+                strict=True,  # pastikan mengutip dari KB saja
+            ),
+            "docs": kb,
+            "result": result,
+        }
     except Exception as e:
         logger.error(f"Error handle info intent: {e}")
-        return _shape(session_id,
+        return {"response": _shape(session.id,
                         answer="Maaf, terjadi kendala saat memuat informasi.",
                         source="llm_error",
                         intent=intent_type,
-                        has_data=False)
+                        has_data=False)}
         
 @router.post("/api/session/clear")
 async def clear_session(request: SessionClearRequest):
     """Clear session data"""
     try:
-        success = memory_manager.cleanup_session(request.session_id)
+        success = await memory_manager.run(memory_manager.cleanup_session, request.session_id)
         return {
             "success": success,
             "message": "Session cleared successfully" if success else "Session not found"
@@ -687,7 +852,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         try:
-            memory_stats = memory_manager.get_session_stats()
+            memory_stats = await memory_manager.run(memory_manager.get_session_stats)
         except Exception:
             memory_stats = {"timestamp": None, "active_sessions": 0}
 
@@ -722,3 +887,22 @@ async def health_check():
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
+
+@router.post("/api/data/refresh")
+async def refresh_data():
+    """Muat ulang snapshot jadwal & buang cache tabel statis (mis. setelah scraper di data/ dijalankan ulang)."""
+    invalidated = db_service.invalidate_cache()
+    if not settings.SCHEDULE_SNAPSHOT_ENABLED:
+        return {"ok": True, "cache_invalidated": invalidated, "snapshot": None}
+    snapshot = await db_service.refresh_snapshot()
+    return {"ok": snapshot["ok"], "cache_invalidated": invalidated, "snapshot": snapshot}
+
+@router.get("/api/metrics")
+async def metrics():
+    """Metrik runtime (pool thread, cache, dsb) untuk observasi performa."""
+    return {
+        "llm": llm_service.get_metrics(),
+        "db": db_service.metrics(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "sessions": await memory_manager.run(memory_manager.metrics),
+    }
@@ -8,27 +8,90 @@ class Settings(BaseSettings):
     """
 
     # --- Wajib ---
-    SUPABASE_URL: str
-    SUPABASE_KEY: str
-
     OPENAI_API_KEY: str
-    PINECONE_API_KEY: str
+
+    # Database: "supabase" (default) atau "sqlite" (lokal, dibangun dari data/csv_files)
+    DB_BACKEND: str = "supabase"
+    SUPABASE_URL: Optional[str] = None  # wajib bila DB_BACKEND=supabase
+    SUPABASE_KEY: Optional[str] = None
+    SQLITE_DB_PATH: str = "data/cache/baak.sqlite3"
+    SQLITE_CSV_DIR: str = "data/csv_files"
 
     # --- Opsional (punya default) ---
     # OpenAI
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"  # 1536 dim
+    # OpenAI HTTP: pool koneksi bersama + timeout per panggilan (detik)
+    OPENAI_TIMEOUT_SECONDS: float = 30.0            # chat completion
+    OPENAI_EMBEDDING_TIMEOUT_SECONDS: float = 10.0  # embedding
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_MAX_CONNECTIONS: int = 50
+    OPENAI_MAX_KEEPALIVE: int = 20
+    OPENAI_MAX_RETRIES: int = 2
+    # Embedding batch (ingestion): banyak input per request, paralel terbatas
+    OPENAI_EMBEDDING_BATCH_SIZE: int = 64
+    OPENAI_EMBEDDING_CONCURRENCY: int = 4
+    OPENAI_EMBEDDING_BATCH_RETRIES: int = 4
+    # Cache embedding persisten (SQLite, float32) untuk ingestion & query berulang
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 20000
+    # Cache jawaban RAG umum: exact (teks ter-normalisasi) lalu semantik (cosine embedding query)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 500
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+
+    # Vector store RAG: "pinecone" (default) atau "local" (NumPy in-process, bisa offline)
+    VECTOR_STORE_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_STORE_PATH: str = "data/cache/vector_store"
 
     # Pinecone (PC2 / serverless, host-based)
+    PINECONE_API_KEY: Optional[str] = None  # wajib bila VECTOR_STORE_BACKEND=pinecone
     PINECONE_INDEX_NAME: str = "chatbot-api"
     PINECONE_INDEX_HOST: Optional[str] = None  # contoh: chatbot-api-xxxxx.svc.<region>.pinecone.io (tanpa https://)
     PINECONE_NAMESPACE: str = "default"
     PINECONE_MIN_SCORE: float = 0.5
+    # Semua panggilan Pinecone lewat thread pool khusus (terpisah dari pool DB)
+    PINECONE_MAX_WORKERS: int = 8
+    PINECONE_TIMEOUT_SECONDS: float = 10.0         # query / stats / delete
+    PINECONE_UPSERT_TIMEOUT_SECONDS: float = 60.0
+    PINECONE_UPSERT_BATCH_SIZE: int = 100          # batas vektor per request upsert
+    PINECONE_UPSERT_CONCURRENCY: int = 4
+    PINECONE_UPSERT_RETRIES: int = 3
+    # Manifest ingestion inkremental (hash file + chunk ID yang sudah di-upsert)
+    KB_MANIFEST_PATH: str = "data/cache/kb_manifest.json"
 
     # (Legacy/compat, tidak dipakai PC2—boleh dihapus jika tidak perlu)
     PINECONE_CLOUD: Optional[str] = None
     PINECONE_REGION: Optional[str] = None
 
+    # Database (Supabase/PostgREST): query sync dijalankan di pool thread khusus
+    DB_MAX_WORKERS: int = 16
+    DB_QUERY_TIMEOUT_SECONDS: float = 8.0
+    # Pool HTTP ke Supabase (PostgREST): koneksi dipakai ulang antar query & antar thread
+    DB_HTTP_MAX_CONNECTIONS: int = 20
+    DB_HTTP_MAX_KEEPALIVE: int = 16
+    DB_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    DB_HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    DB_HTTP2: bool = True                           # butuh paket h2; tanpa h2 otomatis HTTP/1.1
+    DB_PAYLOAD_METRICS: bool = False                # diagnosa: serialize ulang tiap hasil query (ada biaya CPU)
+    # Snapshot in-process jadwal_kuliah / jadwal_uas / wali_kelas (lookup tanpa network)
+    SCHEDULE_SNAPSHOT_ENABLED: bool = True
+    SCHEDULE_SNAPSHOT_REFRESH_MINUTES: int = 60     # 0 = muat sekali, selanjutnya manual
+    SCHEDULE_SNAPSHOT_PAGE_SIZE: int = 1000         # batas max-rows default PostgREST Supabase
+    # Cache read-through tabel statis; entri kedaluwarsa tetap dipakai sambil di-refresh di background
+    DB_CACHE_ENABLED: bool = True
+    DB_CACHE_TTL_LOKET_SECONDS: float = 3600.0
+    DB_CACHE_TTL_KALENDER_SECONDS: float = 21600.0
+    DB_CACHE_TTL_DOSEN_SECONDS: float = 3600.0      # index nama dosen (mode tanpa snapshot)
+    # Kelas yang tidak ditemukan (+ saran rentang prefix); dikosongkan tiap data jadwal di-refresh
+    KELAS_NEGATIVE_CACHE_ENABLED: bool = True
+    KELAS_NEGATIVE_CACHE_MAX_ENTRIES: int = 1000
+    KELAS_NEGATIVE_CACHE_TTL_SECONDS: float = 300.0
+    # Pencocokan nama dosen (trigram): porsi minimal trigram query yang harus ada di nama
+    DOSEN_MATCH_MIN_SCORE: float = 0.6
+
     # Aplikasi
     APP_NAME: str = "Chatbot BAAK Hybrid"
     DEBUG: bool = False
@@ -36,6 +99,18 @@ class Settings(BaseSettings):
     # Sesi
     SESSION_TIMEOUT_MINUTES: int = 30
     MAX_MEMORY_EXCHANGES: int = 3
+    # memory = per proses (1 worker); sqlite = file WAL dibagi antar worker uvicorn di host yang sama
+    SESSION_STORE: str = "memory"
+    SESSION_SQLITE_PATH: str = "data/cache/sessions.sqlite3"
+    SESSION_STORE_MAX_WORKERS: int = 4              # thread untuk operasi store sqlite (bisa menunggu lock WAL)
+    # lebih dari SESSION_MAX_LIVE → sesi paling lama tidak aktif dibuang (0 = tanpa batas);
+    # memory: dicek tiap put (batas keras), sqlite: oleh sweeper (batas lunak)
+    SESSION_MAX_LIVE: int = 20000
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 60        # 0 = sweeper mati (hanya expiry lazy saat get)
+    # Snapshot sesi (store memory) ke file: berkala + saat shutdown, dipulihkan saat startup ("" = mati)
+    SESSION_SNAPSHOT_PATH: str = "data/cache/sessions.snapshot"
+    SESSION_SNAPSHOT_INTERVAL_SECONDS: int = 300
+    SESSION_RESTORE_MAX_SECONDS: float = 2.0        # batas waktu restore → startup tetap cepat
 
     # Pydantic v2 config
     model_config = SettingsConfigDict(
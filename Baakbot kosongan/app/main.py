@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from .api import routes
+from .services.llm_service import llm_service
+from .services.database import db_service
+from .services.memory_manager import memory_manager
 import os, logging
 from logging.handlers import RotatingFileHandler
 
@@ -16,6 +19,22 @@ app.include_router(routes.router)
 def read_root():
     return {"message": "Selamat datang di API Chatbot Hybrid"}
 
+@app.on_event("startup")
+async def on_startup():
+    # snapshot jadwal dimuat di background; sampai siap, query tetap ke Supabase
+    db_service.start_snapshot_refresh()
+    # sesi dari deploy sebelumnya (clarification yang sedang berjalan tidak hilang)
+    memory_manager.restore_snapshot()
+    memory_manager.start_sweeper()
+    memory_manager.start_snapshots()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # tutup pool koneksi HTTP yang dipakai bersama
+    await llm_service.aclose()
+    db_service.close()
+    memory_manager.close()
+
 
 def setup_logging():
     os.makedirs("logs", exist_ok=True)
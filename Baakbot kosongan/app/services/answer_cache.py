@@ -0,0 +1,194 @@
+# Cache jawaban LLM/RAG (in-memory) di depan jalur RAG umum pada routes._handle_llm_query
+"""
+Answer Cache
+- Lookup 1 (exact)   : pertanyaan ter-normalisasi + versi KB
+- Lookup 2 (semantik): embedding query paling mirip (cosine >= threshold) di antara entri
+                       dengan versi KB dan set chunk ID hasil retrieval yang sama persis
+- Versi KB = manifest ingestion → re-ingest yang mengubah chunk otomatis membuang entri lama
+- TTL per entri + eviction LRU saat melewati kapasitas
+- Counter hit/miss untuk /api/metrics
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    question: str
+    kb_version: str
+    chunk_key: Tuple[str, ...]
+    embedding: List[float]           # sudah dinormalisasi (panjang 1) → cosine = dot product
+    payload: Dict[str, Any]
+    expires_at: float
+    hits: int = 0
+    created_at: float = field(default_factory=time.time)
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = 500, ttl_seconds: float = 3600.0, similarity: float = 0.95):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity = float(similarity)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # (kb_version, chunk_key) → key entri; kandidat lookup semantik cukup dalam satu bucket
+        self._buckets: Dict[Tuple[str, Tuple[str, ...]], Dict[Tuple[str, str], None]] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---------------- Helpers ----------------
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join((text or "").split()).casefold()
+
+    @staticmethod
+    def _unit(vec: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in vec))
+        return [v / norm for v in vec] if norm else []
+
+    @staticmethod
+    def _chunk_key(chunk_ids: List[str]) -> Tuple[str, ...]:
+        return tuple(sorted(set(i for i in chunk_ids if i)))
+
+    def _drop_locked(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        bkey = (entry.kb_version, entry.chunk_key)
+        bucket = self._buckets.get(bkey)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[bkey]
+
+    def _alive_locked(self, key: Tuple[str, str], now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry and entry.expires_at <= now:
+            self._drop_locked(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _hit_locked(self, key: Tuple[str, str], entry: _Entry) -> Dict[str, Any]:
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        return dict(entry.payload)
+
+    # ---------------- Public API ----------------
+    def get_exact(self, question: str, kb_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Jawaban tersimpan untuk pertanyaan yang sama persis (setelah normalisasi)."""
+        key = (str(kb_version), self.normalize(question))
+        with self._lock:
+            entry = self._alive_locked(key, time.time())
+            if entry:
+                self.exact_hits += 1
+                return self._hit_locked(key, entry)
+        return None
+
+    def get_similar(
+        self, embedding: List[float], chunk_ids: List[str], kb_version: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Jawaban dari pertanyaan lain yang mirip secara semantik dan mengambil chunk KB yang sama."""
+        unit = self._unit(embedding or [])
+        chunk_key = self._chunk_key(chunk_ids)
+        if not unit or not chunk_key:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            best_key, best_score = None, self.similarity
+            for key in list(self._buckets.get((str(kb_version), chunk_key), ())):
+                entry = self._alive_locked(key, now)
+                if not entry or len(entry.embedding) != len(unit):
+                    continue
+                score = sum(a * b for a, b in zip(unit, entry.embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.semantic_hits += 1
+            return self._hit_locked(best_key, self._entries[best_key])
+
+    def put(
+        self,
+        question: str,
+        kb_version: Optional[str],
+        embedding: List[float],
+        chunk_ids: List[str],
+        payload: Dict[str, Any],
+    ) -> None:
+        """Simpan jawaban final (payload = field respons: answer, source, has_data)."""
+        version = str(kb_version)
+        key = (version, self.normalize(question))
+        entry = _Entry(
+            question=key[1],
+            kb_version=version,
+            chunk_key=self._chunk_key(chunk_ids),
+            embedding=self._unit(embedding or []),
+            payload=dict(payload),
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        with self._lock:
+            # versi KB berganti → entri versi lama tidak akan pernah cocok lagi, buang sekaligus
+            stale = [k for k in self._entries if k[0] != version]
+            for k in stale:
+                self._drop_locked(k)
+            if stale:
+                logger.info(f"Answer cache dropped {len(stale)} entries from previous KB version")
+
+            self._drop_locked(key)
+            self._entries[key] = entry
+            self._buckets.setdefault((version, entry.chunk_key), {})[key] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Singleton instance (None bila dimatikan lewat ANSWER_CACHE_ENABLED=false)
+answer_cache: Optional[AnswerCache] = (
+    AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity=settings.ANSWER_CACHE_SIMILARITY,
+    )
+    if settings.ANSWER_CACHE_ENABLED else None
+)
@@ -1,24 +1,275 @@
-from supabase import create_client, Client
-from typing import List, Dict, Optional, Any
-import os, re
+from typing import List, Dict, Optional, Any, Tuple
+import os, re, time
 import asyncio
+import json
+import logging
+import threading
 from app.config import settings
+from app.services.schedule_snapshot import ScheduleSnapshot, empty_prefix_stats
+from app.services.sqlite_backend import SQLiteClient
+from app.utils.executor import MeteredExecutor
+from app.utils.helpers import FORMATTER_COLUMNS
+from app.utils.name_index import NameIndex
+from app.utils.negative_cache import NegativeCache
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def select_columns(*intents: str) -> str:
+    """Daftar kolom select untuk intent (gabungan bila satu tabel melayani beberapa intent)."""
+    return ",".join(dict.fromkeys(c for i in intents for c in FORMATTER_COLUMNS[i]))
+
+
+# tabel snapshot → kolom yang dimuat
+SNAPSHOT_TABLES = {
+    "jadwal_kuliah": select_columns("jadwal_kuliah", "jadwal_dosen"),
+    "jadwal_uas": select_columns("jadwal_uas"),
+    "wali_kelas": select_columns("wali_kelas"),
+}
 
 
 class DatabaseService:
     def __init__(self):
-        self.supabase: Client = create_client(
-            settings.SUPABASE_URL, 
-            settings.SUPABASE_KEY
+        # Backend: Supabase (hosted) atau SQLite lokal dengan API builder yang sama
+        self.backend = (settings.DB_BACKEND or "supabase").lower()
+        if self.backend == "sqlite":
+            self.supabase = SQLiteClient(settings.SQLITE_DB_PATH, settings.SQLITE_CSV_DIR)
+        elif self.backend == "supabase":
+            if not (settings.SUPABASE_URL and settings.SUPABASE_KEY):
+                raise ValueError("SUPABASE_URL dan SUPABASE_KEY wajib diisi untuk DB_BACKEND=supabase")
+            # import di sini: mode sqlite tidak butuh paket supabase/postgrest
+            from app.services.supabase_http import create_postgrest_client
+            # satu pool HTTP (keep-alive, HTTP/2) dipakai bersama semua thread pool DB
+            self.supabase = create_postgrest_client(
+                settings.SUPABASE_URL,
+                settings.SUPABASE_KEY,
+                max_connections=settings.DB_HTTP_MAX_CONNECTIONS,
+                max_keepalive=settings.DB_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.DB_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                connect_timeout=settings.DB_HTTP_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=settings.DB_QUERY_TIMEOUT_SECONDS,
+                http2=settings.DB_HTTP2,
+            )
+        else:
+            raise ValueError(f"DB_BACKEND tidak dikenal: {settings.DB_BACKEND!r} (pilih supabase / sqlite)")
+        # Semua query PostgREST (sync) lewat pool ini → event loop tidak pernah ikut menunggu
+        self.pool = MeteredExecutor(
+            "db",
+            max_workers=settings.DB_MAX_WORKERS,
+            timeout=settings.DB_QUERY_TIMEOUT_SECONDS,
         )
+        # Snapshot jadwal in-process (None = belum dimuat / dimatikan → query Supabase langsung)
+        self.snapshot: Optional[ScheduleSnapshot] = None
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._snapshot_errors = 0
+        self._snapshot_last_error: Optional[str] = None
+        self._snapshot_hits = 0
+        # Cache read-through tabel statis (jadwal_loket, kalender_akademik)
+        self.cache = TTLCache("db")
+        # Ukuran payload per query (bytes JSON + estimasi waktu decode)
+        self._payload: Dict[str, Dict[str, float]] = {}
+        self._payload_lock = threading.Lock()
+        # Kelas yang tidak ditemukan (typo / tidak ada) + saran rentang prefix-nya
+        self.negative = NegativeCache(
+            "kelas_not_found",
+            max_entries=settings.KELAS_NEGATIVE_CACHE_MAX_ENTRIES,
+            ttl=settings.KELAS_NEGATIVE_CACHE_TTL_SECONDS,
+        ) if settings.KELAS_NEGATIVE_CACHE_ENABLED else None
     
     def normalize_kelas(self, kelas: str) -> str:
         """Normalize class input: 1ka01 -> 1KA01"""
         return kelas.upper().strip()
     
-    async def _to_thread(self, fn):
-        """Jalankan fungsi sync di thread agar tidak memblok event loop."""
-        return await asyncio.to_thread(fn)
+    async def _to_thread(self, fn, timeout: Optional[float] = None):
+        """Jalankan fungsi sync di pool DB agar tidak memblok event loop (timeout per query)."""
+        return await self.pool.run(fn, timeout=timeout)
+
+    async def _execute(self, name: str, query) -> List[Dict[str, Any]]:
+        """Jalankan query builder di pool DB → .data; ukuran payload dicatat atas nama `name`."""
+        def _run():
+            rows = query.execute().data or []
+            if settings.DB_PAYLOAD_METRICS:
+                self._record_payload(name, rows)
+            return rows
+        return await self._to_thread(_run)
+
+    async def _fan_out(self, *queries: Tuple[str, Any], return_exceptions: bool = False) -> List[Any]:
+        """
+        Jalankan beberapa (nama, query builder) sekaligus di pool DB (latensi = query terlambat,
+        bukan jumlah semuanya). Hasil = list .data sesuai urutan query; dengan
+        return_exceptions=True query yang gagal menghasilkan objek exception-nya.
+        """
+        return await asyncio.gather(
+            *(self._execute(name, q) for name, q in queries), return_exceptions=return_exceptions
+        )
+
+    def _record_payload(self, name: str, rows: List[Dict[str, Any]]) -> None:
+        # bytes ≈ body JSON PostgREST; decode_ms = json.loads ulang body itu (dijalankan di thread pool)
+        body = json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=str)
+        started = time.perf_counter()
+        json.loads(body)
+        decode_ms = (time.perf_counter() - started) * 1000
+        size = len(body.encode("utf-8"))
+        with self._payload_lock:
+            st = self._payload.setdefault(name, {"queries": 0, "rows": 0, "bytes": 0, "max_bytes": 0, "decode_ms": 0.0})
+            st["queries"] += 1
+            st["rows"] += len(rows)
+            st["bytes"] += size
+            st["max_bytes"] = max(st["max_bytes"], size)
+            st["decode_ms"] += decode_ms
+
+    def payload_stats(self) -> Dict[str, Any]:
+        with self._payload_lock:
+            items = {k: dict(v) for k, v in self._payload.items()}
+        return {
+            name: {
+                "queries": st["queries"],
+                "rows": st["rows"],
+                "bytes": st["bytes"],
+                "max_bytes": st["max_bytes"],
+                "avg_bytes": round(st["bytes"] / st["queries"]),
+                "bytes_per_row": round(st["bytes"] / st["rows"], 1) if st["rows"] else None,
+                "avg_decode_ms": round(st["decode_ms"] / st["queries"], 3),
+            }
+            for name, st in sorted(items.items())
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "sqlite": self.supabase.stats() if self.backend == "sqlite" else None,
+            "http": self.supabase.stats() if self.backend == "supabase" else None,
+            "pool": self.pool.stats(),
+            "cache": self.cache.stats(),
+            "payload": self.payload_stats(),
+            "negative_cache": self.negative.stats() if self.negative else None,
+            "snapshot": {
+                "enabled": settings.SCHEDULE_SNAPSHOT_ENABLED,
+                "hits": self._snapshot_hits,
+                "refresh_errors": self._snapshot_errors,
+                "last_error": self._snapshot_last_error,
+                **(self.snapshot.stats() if self.snapshot else {"loaded_at": None}),
+            },
+        }
+
+    def close(self) -> None:
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+        self.pool.shutdown()
+        if self.backend == "supabase":
+            self.supabase.close()  # tutup koneksi keep-alive ke Supabase
+
+    async def _cached(self, key: tuple, loader, ttl: float):
+        if not settings.DB_CACHE_ENABLED:
+            return await loader()
+        return await self.cache.get(key, loader, ttl)
+
+    def invalidate_cache(self, table: Optional[str] = None) -> int:
+        """Hook invalidasi cache tabel statis (semua, atau satu tabel mis. 'kalender_akademik')."""
+        if self.negative and (table is None or table in SNAPSHOT_TABLES):
+            self.negative.clear()
+        return self.cache.invalidate(table)
+
+    # ---------------- Cache kelas tidak ditemukan ----------------
+    @staticmethod
+    def _miss_key(table: str, kelas: str) -> tuple:
+        return (table, (kelas or "").strip().upper())
+
+    def _known_missing(self, table: str, kelas: str) -> bool:
+        return bool(self.negative) and self.negative.get(self._miss_key(table, kelas)) is not None
+
+    def _remember_missing(self, table: str, kelas: str, generation: Optional[int]) -> None:
+        if self.negative:
+            self.negative.put(self._miss_key(table, kelas), {}, generation)
+
+    async def missing_kelas_hint(self, table: str, kelas: str) -> Optional[Dict[str, Any]]:
+        """
+        Saran untuk kelas yang tidak ditemukan: {"prefix", "stats"} (stats = get_kelas_prefix_stats),
+        None bila kelas tidak berpola prefix. Disimpan di entri negative cache kelas tsb →
+        typo yang sama berikutnya tidak menghitung ulang.
+        """
+        key = self._miss_key(table, kelas)
+        entry = self.negative.get(key) if self.negative else None
+        if entry and "stats" in entry:
+            return {"prefix": entry["prefix"], "stats": dict(entry["stats"])}
+
+        m = re.match(r"^([1-6][A-Za-z]{2,3})", (kelas or "").strip())
+        if not m:
+            return None
+        prefix = m.group(1).upper()
+        generation = self.negative.generation if self.negative else None
+        stats = await self.get_kelas_prefix_stats(prefix)
+        if entry is not None:  # hanya kelas yang memang tercatat "tidak ditemukan"
+            self.negative.put(key, {"prefix": prefix, "stats": stats}, generation)
+        return {"prefix": prefix, "stats": dict(stats)}
+
+    # ---------------- Snapshot jadwal ----------------
+    def _snap(self) -> Optional[ScheduleSnapshot]:
+        snap = self.snapshot
+        if snap is not None:
+            self._snapshot_hits += 1
+        return snap
+
+    async def _fetch_all(self, table: str, columns: str, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ambil seluruh isi tabel per halaman (.range), karena PostgREST membatasi baris per respons."""
+        page = max(1, settings.SCHEDULE_SNAPSHOT_PAGE_SIZE)
+        rows: List[Dict[str, Any]] = []
+        while True:
+            start = len(rows)
+            # tanpa ORDER BY urutan antar request tidak dijamin → halaman bisa tumpang tindih/terlewat
+            query = self.supabase.table(table).select(columns).order("id").range(start, start + page - 1)
+            data = await self._execute(name or f"{table}.all", query)
+            rows.extend(data)
+            # berhenti di halaman kosong (bukan "kurang dari page") → aman bila max-rows server < page
+            if not data:
+                return rows
+
+    async def refresh_snapshot(self) -> Dict[str, Any]:
+        """
+        Muat ulang jadwal_kuliah, jadwal_uas, wali_kelas lalu tukar snapshot sekaligus.
+        Gagal di tabel mana pun → snapshot lama tetap dipakai.
+        """
+        async with self._snapshot_lock:
+            started = time.perf_counter()
+            try:
+                if self.backend == "sqlite":
+                    await self._to_thread(self.supabase.ensure_built)  # CSV baru → bangun ulang dulu
+                kuliah, uas, wali = await asyncio.gather(*(self._fetch_all(t, c) for t, c in SNAPSHOT_TABLES.items()))
+                if not kuliah:
+                    raise ValueError("jadwal_kuliah kosong")
+                snap = ScheduleSnapshot(kuliah, uas, wali)
+            except Exception as e:
+                self._snapshot_errors += 1
+                self._snapshot_last_error = str(e) or e.__class__.__name__
+                logger.error(f"Schedule snapshot refresh failed (keeping previous): {self._snapshot_last_error}")
+                return {"ok": False, "error": self._snapshot_last_error}
+            self.snapshot = snap
+            self._snapshot_last_error = None
+            if self.negative:
+                self.negative.clear()  # data baru → kelas yang tadinya tidak ada bisa jadi ada
+            stats = snap.stats()
+            logger.info(f"Schedule snapshot loaded in {(time.perf_counter() - started) * 1000:.0f} ms: {stats}")
+            return {"ok": True, **stats}
+
+    def start_snapshot_refresh(self) -> None:
+        """Muat snapshot di background lalu refresh berkala (dipanggil saat startup)."""
+        if not settings.SCHEDULE_SNAPSHOT_ENABLED or self._snapshot_task:
+            return
+
+        async def _loop():
+            interval = settings.SCHEDULE_SNAPSHOT_REFRESH_MINUTES * 60
+            while True:
+                res = await self.refresh_snapshot()
+                if not res["ok"] and self.snapshot is None:
+                    await asyncio.sleep(60)  # belum pernah berhasil dimuat → coba lagi lebih cepat
+                    continue
+                if interval <= 0:
+                    return  # hanya refresh manual (refresh_snapshot)
+                await asyncio.sleep(interval)
+
+        self._snapshot_task = asyncio.get_running_loop().create_task(_loop())
 
     async def ping(self) -> bool:
         """Ping ringan ke DB (dipakai health check)."""
@@ -41,27 +292,22 @@ class DatabaseService:
         p_upper = prefix.upper()
         p_lower = prefix.lower()
 
-        try:
-            # jadwal_kuliah: kelas disimpan uppercase (berdasar fungsi-fungsi yang ada)
-            resp1 = self.supabase.table("jadwal_kuliah") \
-                .select("kelas") \
-                .ilike("kelas", f"{p_upper}%") \
-                .execute()
-            rows1 = resp1.data or []
-        except Exception:
-            rows1 = []
+        snap = self._snap()
+        if snap:
+            return self._sort_kelas(snap.kelas_by_prefix(p_upper, include_uas=include_uas), p_upper)
 
-        rows2 = []
+        # jadwal_kuliah: kelas disimpan uppercase (berdasar fungsi-fungsi yang ada)
+        queries = [("jadwal_kuliah.prefix", self.supabase.table("jadwal_kuliah").select("kelas").ilike("kelas", f"{p_upper}%"))]
         if include_uas:
-            try:
-                # jadwal_uas: kelas disimpan lowercase (lihat get_jadwal_uas_by_kelas)
-                resp2 = self.supabase.table("jadwal_uas") \
-                    .select("kelas") \
-                    .ilike("kelas", f"{p_lower}%") \
-                    .execute()
-                rows2 = resp2.data or []
-            except Exception:
-                rows2 = []
+            # jadwal_uas: kelas disimpan lowercase (lihat get_jadwal_uas_by_kelas)
+            queries.append(("jadwal_uas.prefix", self.supabase.table("jadwal_uas").select("kelas").ilike("kelas", f"{p_lower}%")))
+        # satu tabel gagal → anggap kosong, tabel lain tetap dipakai
+        results = [
+            [] if isinstance(r, BaseException) else r
+            for r in await self._fan_out(*queries, return_exceptions=True)
+        ]
+        rows1 = results[0]
+        rows2 = results[1] if include_uas else []
 
         # Gabungkan, normalisasi ke UPPER, dedup
         kelas_set = set()
@@ -74,6 +320,10 @@ class DatabaseService:
             if k:
                 kelas_set.add(k.upper())
 
+        return self._sort_kelas(kelas_set, p_upper)
+
+    @staticmethod
+    def _sort_kelas(kelas_set, p_upper: str) -> List[str]:
         # Urutkan secara natural berdasarkan suffix 2 digit (kalau ada)
         def _suffix_num(k: str) -> int:
             m = re.search(r"(\d{2})$", k)
@@ -86,20 +336,22 @@ class DatabaseService:
     async def get_kelas_prefix_stats(self, prefix: str) -> Dict[str, Any]:
         """
         Hitung min/max nomor kelas untuk prefix (mis. 3KA, 3KB, 2TI, 4MI, dst).
-        Menghitung dari tabel jadwal_kuliah. Bisa kamu perluas ke UAS bila mau.
+        Dengan snapshot: index prefix (jadwal_kuliah + jadwal_uas) yang dibangun tiap refresh.
+        Tanpa snapshot: hitung dari tabel jadwal_kuliah.
         """
         p = (prefix or "").strip().upper()
         if not re.fullmatch(r"[1-6][A-Z]{2,3}", p):
-            return {"exists": False, "min": None, "max": None, "count": 0}
+            return empty_prefix_stats()
+
+        snap = self._snap()
+        if snap:
+            return snap.prefix_stats(p)
 
         try:
-            def _q():
-                return (self.supabase.table("jadwal_kuliah")
-                        .select("kelas")
-                        .ilike("kelas", f"{p}%")
-                        .execute())
-            resp = await self._to_thread(_q)
-            rows = resp.data or []
+            rows = await self._execute(
+                "jadwal_kuliah.prefix",
+                self.supabase.table("jadwal_kuliah").select("kelas").ilike("kelas", f"{p}%"),
+            )
 
             nums = []
             bases = set()
@@ -112,142 +364,196 @@ class DatabaseService:
                     bases.add(f"{p}{m.group(1)}")
 
             if not nums:
-                return {"exists": False, "min": None, "max": None, "count": 0}
+                return empty_prefix_stats()
 
             return {
                 "exists": True,
                 "min": min(nums),
                 "max": max(nums),
-                "count": len(bases)
+                "count": len(bases),
+                "kelas": sorted(bases),
             }
         except Exception as e:
             print(f"Error prefix stats: {e}")
-            return {"exists": False, "min": None, "max": None, "count": 0}
+            return empty_prefix_stats()
         
     async def get_jadwal_kuliah_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
         k = self.normalize_kelas(kelas)  # upper + strip
-        try:
-            # 3 pola: base+2digit(+opsi huruf)
-            base2 = re.fullmatch(r"[1-6][A-Z]{2,3}\d{2}", k)              # 3KA11 / 3KB08 / 2MI03 ...
-            with_suffix = re.fullmatch(r"[1-6][A-Z]{2,3}\d{2}[A-Z]$", k)  # 3KA11A / 3KB08B ...
-            if with_suffix:
-                q = self.supabase.table("jadwal_kuliah").select("*").eq("kelas", k)
-            elif base2:
-                q = self.supabase.table("jadwal_kuliah").select("*").ilike("kelas", f"{k}%")
-            else:
-                # fallback: exact
-                q = self.supabase.table("jadwal_kuliah").select("*").eq("kelas", k)
-
-            resp = await self._to_thread(lambda: q.execute())
-            return resp.data or []
-        except Exception as e:
-            print(f"Error querying jadwal_kuliah: {e}")
+        if self._known_missing("jadwal_kuliah", k):
             return []
+        generation = self.negative.generation if self.negative else None
+        snap = self._snap()
+        if snap:
+            data = snap.jadwal_kuliah_by_kelas(k)
+        else:
+            try:
+                # 3 pola: base+2digit(+opsi huruf)
+                base2 = re.fullmatch(r"[1-6][A-Z]{2,3}\d{2}", k)              # 3KA11 / 3KB08 / 2MI03 ...
+                with_suffix = re.fullmatch(r"[1-6][A-Z]{2,3}\d{2}[A-Z]$", k)  # 3KA11A / 3KB08B ...
+                q = self.supabase.table("jadwal_kuliah").select(select_columns("jadwal_kuliah"))
+                if with_suffix:
+                    q = q.eq("kelas", k)
+                elif base2:
+                    q = q.ilike("kelas", f"{k}%")
+                else:
+                    # fallback: exact
+                    q = q.eq("kelas", k)
+
+                data = await self._execute("jadwal_kuliah.kelas", q)
+            except Exception as e:
+                print(f"Error querying jadwal_kuliah: {e}")
+                return []  # error bukan "tidak ditemukan" → tidak di-cache
+        if not data:
+            self._remember_missing("jadwal_kuliah", k, generation)
+        return data
     
     async def get_jadwal_kuliah_by_dosen(self, dosen: str) -> List[Dict[str, Any]]:
         """Get schedule by lecturer (partial matching)"""
         dosen_normalized = dosen.upper().strip()
+        snap = self._snap()
+        if snap:
+            return snap.jadwal_kuliah_by_dosen(dosen_normalized, min_score=settings.DOSEN_MATCH_MIN_SCORE)
+
+        # Tanpa snapshot: index nama dosen (di-cache) → nama kanonik → query exact in_()
+        try:
+            index = await self._cached(
+                ("jadwal_kuliah", "dosen_index"), self._load_dosen_index, settings.DB_CACHE_TTL_DOSEN_SECONDS
+            )
+            names = index.resolve(dosen_normalized, min_score=settings.DOSEN_MATCH_MIN_SCORE)
+            if not names:
+                return []
+            if len(names) <= 50:  # daftar nama sangat panjang → URL kepanjangan, pakai ilike lama
+                return await self._execute(
+                    "jadwal_kuliah.dosen",
+                    self.supabase.table("jadwal_kuliah")
+                    .select(select_columns("jadwal_dosen"))
+                    .in_("dosen", names),
+                )
+        except Exception as e:
+            print(f"Error resolving dosen name, fallback to ilike: {e}")
         
         try:
-            response = self.supabase.table("jadwal_kuliah")\
-                .select("*")\
-                .ilike("dosen", f"%{dosen_normalized}%")\
-                .execute()
-            
-            return response.data
+            return await self._execute(
+                "jadwal_kuliah.dosen",
+                self.supabase.table("jadwal_kuliah")
+                .select(select_columns("jadwal_dosen"))
+                .ilike("dosen", f"%{dosen_normalized}%"),
+            )
         except Exception as e:
             print(f"Error querying jadwal_kuliah by dosen: {e}")
             return []
     
+    async def _load_dosen_index(self) -> NameIndex:
+        rows = await self._fetch_all("jadwal_kuliah", "dosen", name="jadwal_kuliah.dosen_index")
+        return NameIndex({r.get("dosen") for r in rows if r.get("dosen")})
+
     async def get_jadwal_uas_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
         """Get UAS schedule by class (data disimpan lowercase, dukung 3KA11A/B/C)."""
         k = (kelas or "").strip().lower()
-        try:
-            def _q():
-                q = self.supabase.table("jadwal_uas").select("*")
+        if self._known_missing("jadwal_uas", k):
+            return []
+        generation = self.negative.generation if self.negative else None
+        snap = self._snap()
+        if snap:
+            data = snap.jadwal_uas_by_kelas(k)
+        else:
+            try:
+                q = self.supabase.table("jadwal_uas").select(select_columns("jadwal_uas"))
                 if re.search(r"[a-z]$", k):
                     q = q.eq("kelas", k)        # exact kalau ada huruf
                 else:
                     q = q.ilike("kelas", f"{k}%")  # basis -> semua varian
-                return q.execute()
-            resp = await self._to_thread(_q)
-            return resp.data or []
-        except Exception as e:
-            print(f"Error querying jadwal_uas: {e}")
-            return []
+                data = await self._execute("jadwal_uas.kelas", q)
+            except Exception as e:
+                print(f"Error querying jadwal_uas: {e}")
+                return []
+        if not data:
+            self._remember_missing("jadwal_uas", k, generation)
+        return data
     
     async def get_wali_kelas_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
         """Get homeroom teacher by class"""
         normalized_kelas = self.normalize_kelas(kelas)
+        snap = self._snap()
+        if snap:
+            return snap.wali_kelas_by_kelas(normalized_kelas)
         
         try:
-            response = self.supabase.table("wali_kelas")\
-                .select("*")\
-                .eq("kelas", normalized_kelas)\
-                .execute()
-            
-            return response.data
+            return await self._execute(
+                "wali_kelas.kelas",
+                self.supabase.table("wali_kelas")
+                .select(select_columns("wali_kelas"))
+                .eq("kelas", normalized_kelas),
+            )
         except Exception as e:
             print(f"Error querying wali_kelas: {e}")
             return []
     
     async def get_jadwal_loket(self) -> List[Dict[str, Any]]:
-        """Get BAAK service counter schedule (static data)"""
+        """Get BAAK service counter schedule (static data, lewat cache TTL)"""
         try:
-            response = self.supabase.table("jadwal_loket")\
-                .select("*")\
-                .execute()
-            
-            return response.data
+            return list(await self._cached(("jadwal_loket",), self._query_jadwal_loket, settings.DB_CACHE_TTL_LOKET_SECONDS))
         except Exception as e:
             print(f"Error querying jadwal_loket: {e}")
             return []
 
+    async def _query_jadwal_loket(self) -> List[Dict[str, Any]]:
+        return await self._execute(
+            "jadwal_loket",
+            self.supabase.table("jadwal_loket").select(select_columns("jadwal_loket")),
+        )
+
     async def get_kalender_akademik(self, term: Optional[str] = None, group: Optional[str] = None) -> List[Dict[str, Any]]:
         """Ambil entri kalender; bisa difilter istilah (uts, uas, cuti, krs, daftar_ulang, libur, uji_kompetensi)."""
         try:
-            # Khusus grup 'perkuliahan sebelum/setelah UTS' → ambil parent  anak
-            if group in ("sebelum_uts", "setelah_uts"):
-                key = "sebelum uts" if group == "sebelum_uts" else "setelah uts"
-                patt = f"%perkuliahan {key}%"
-                # parent
-                parent = self.supabase.table("kalender_akademik")\
-                    .select("*")\
-                    .ilike("kegiatan", patt)\
-                    .execute()
-                # children
-                children = self.supabase.table("kalender_akademik")\
-                    .select("*")\
-                    .ilike("parent_kegiatan", patt)\
-                    .order("start_date", desc=False)\
-                    .order("ord", desc=False)\
-                    .execute()
-                p = (parent.data or [])
-                c = (children.data or [])
-                return p + c
-
-            # Fallback: filter by term (uts/uas/...)
-            q = self.supabase.table("kalender_akademik").select("*")
-            if term == "uts":
-                q = q.ilike("kegiatan", "%ujian tengah%")
-            elif term == "uas":
-                q = q.ilike("kegiatan", "%ujian akhir%")
-            elif term == "cuti":
-                q = q.ilike("kegiatan", "%cuti%")
-            elif term == "krs":
-                q = q.ilike("kegiatan", "%krs%")
-            elif term == "daftar_ulang":
-                q = q.ilike("kegiatan", "%daftar ulang%")
-            elif term == "libur":
-                q = q.ilike("kegiatan", "%libur%")
-            elif term == "uji_kompetensi":
-                q = q.ilike("kegiatan", "%uji kompetensi%")
-
-            resp = q.order("start_date", desc=False).order("ord", desc=False).execute()
-            return resp.data
+            return list(await self._cached(
+                ("kalender_akademik", term, group),
+                lambda: self._query_kalender_akademik(term, group),
+                settings.DB_CACHE_TTL_KALENDER_SECONDS,
+            ))
         except Exception as e:
             print(f"Error querying kalender_akademik: {e}")
             return []
 
+    async def _query_kalender_akademik(self, term: Optional[str], group: Optional[str]) -> List[Dict[str, Any]]:
+        # Khusus grup 'perkuliahan sebelum/setelah UTS' → ambil parent  anak
+        if group in ("sebelum_uts", "setelah_uts"):
+            key = "sebelum uts" if group == "sebelum_uts" else "setelah uts"
+            patt = f"%perkuliahan {key}%"
+            # parent & children diambil bersamaan
+            cols = select_columns("kalender_akademik")
+            p, c = await self._fan_out(
+                ("kalender_akademik.group", self.supabase.table("kalender_akademik")
+                 .select(cols)
+                 .ilike("kegiatan", patt)),
+                ("kalender_akademik.group", self.supabase.table("kalender_akademik")
+                 .select(cols)
+                 .ilike("parent_kegiatan", patt)
+                 .order("start_date", desc=False)
+                 .order("ord", desc=False)),
+            )
+            return p + c
+
+        # Fallback: filter by term (uts/uas/...)
+        q = self.supabase.table("kalender_akademik").select(select_columns("kalender_akademik"))
+        if term == "uts":
+            q = q.ilike("kegiatan", "%ujian tengah%")
+        elif term == "uas":
+            q = q.ilike("kegiatan", "%ujian akhir%")
+        elif term == "cuti":
+            q = q.ilike("kegiatan", "%cuti%")
+        elif term == "krs":
+            q = q.ilike("kegiatan", "%krs%")
+        elif term == "daftar_ulang":
+            q = q.ilike("kegiatan", "%daftar ulang%")
+        elif term == "libur":
+            q = q.ilike("kegiatan", "%libur%")
+        elif term == "uji_kompetensi":
+            q = q.ilike("kegiatan", "%uji kompetensi%")
+
+        return await self._execute(
+            "kalender_akademik", q.order("start_date", desc=False).order("ord", desc=False)
+        )
+
 # Singleton instance
 db_service = DatabaseService()
\ No newline at end of file
@@ -0,0 +1,190 @@
+# Cache embedding persisten di disk (SQLite), dipakai oleh llm_service.create_embedding(s)
+"""
+Embedding Cache
+- Key  : sha1(model + teks ter-normalisasi)  → ganti model = otomatis cache baru
+- Value: vektor float32 (BLOB) → ~6 KB per embedding 1536 dimensi
+- Eviction LRU berbasis kolom last_used saat jumlah entri melewati batas
+- Cache hit tidak langsung menulis: last_used dikumpulkan di memori lalu ditulis sekaligus
+  (bersama put berikutnya, saat antrean penuh, sebelum eviction, atau saat close)
+- Semua method blocking → panggil dari thread (asyncio.to_thread), bukan langsung di event loop
+- Counter hit/miss untuk /api/metrics
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# jumlah update last_used yang ditahan sebelum dipaksa ditulis
+TOUCH_FLUSH_THRESHOLD = 256
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int = 20000):
+        self.path = Path(path)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key → last_used yang belum ditulis
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vec BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # ---------------- Helpers ----------------
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Samakan spasi & huruf besar/kecil agar pertanyaan yang sama persis berbagi entri."""
+        return " ".join((text or "").split()).casefold()
+
+    @classmethod
+    def make_key(cls, model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\x00{cls.normalize(text)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vec: List[float]) -> bytes:
+        return array("f", vec).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        arr = array("f")
+        arr.frombytes(blob)
+        return arr.tolist()
+
+    # ---------------- Public API ----------------
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Ambil embedding untuk banyak teks; None untuk yang belum ada di cache."""
+        keys = [self.make_key(model, t) for t in texts]
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # batas parameter SQLite → query per 500 key
+            uniq = list(dict.fromkeys(keys))
+            for i in range(0, len(uniq), 500):
+                part = uniq[i:i + 500]
+                marks = ",".join("?" * len(part))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part
+                ):
+                    found[key] = blob
+            if found:
+                now = time.time()
+                for k in found:
+                    self._touched[k] = now
+                if len(self._touched) >= TOUCH_FLUSH_THRESHOLD:
+                    self._flush_touched_locked()
+            out = [self._unpack(found[k]) if k in found else None for k in keys]
+            hit = sum(1 for v in out if v is not None)
+            self.hits += hit
+            self.misses += len(out) - hit
+        return out
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, items: List[tuple]) -> None:
+        """Simpan [(teks, embedding), ...] lalu lakukan eviction bila melewati batas."""
+        rows = [
+            (self.make_key(model, t), model, len(vec), self._pack(vec), time.time())
+            for t, vec in items if vec
+        ]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings(key, model, dim, vec, last_used) VALUES (?,?,?,?,?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            self._write_touched_locked()
+            self._conn.execute("COMMIT")
+            if self._count > self.max_entries:
+                self._evict_locked()
+
+    def put(self, model: str, text: str, vec: List[float]) -> None:
+        self.put_many(model, [(text, vec)])
+
+    def _write_touched_locked(self) -> None:
+        # dipanggil di dalam transaksi yang sudah dibuka pemanggil
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used=? WHERE key=?",
+                [(ts, k) for k, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _flush_touched_locked(self) -> None:
+        if not self._touched:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._write_touched_locked()
+        finally:
+            self._conn.execute("COMMIT")
+
+    def flush(self) -> None:
+        """Tulis update last_used yang masih tertahan."""
+        with self._lock:
+            self._flush_touched_locked()
+
+    def _evict_locked(self) -> None:
+        # buang entri paling lama tak terpakai sampai tersisa ~90% kapasitas (hindari evict tiap insert)
+        target = int(self.max_entries * 0.9)
+        drop = self._count - target
+        if drop <= 0:
+            return
+        self._flush_touched_locked()  # urutan LRU harus memakai last_used terbaru
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (drop,),
+        )
+        self.evictions += drop
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache evicted {drop} entries (now {self._count})")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._touched.clear()
+            self._count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "pending_touches": len(self._touched),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush_touched_locked()
+            except Exception as e:
+                logger.warning(f"Embedding cache flush on close failed: {e}")
+            self._conn.close()
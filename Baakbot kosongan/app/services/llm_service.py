@@ -1,77 +1,195 @@
-# Logika untuk integrasi dengan OpenAI (untuk jawaban) dan Pinecone (untuk RAG)
-from openai import OpenAI
-from pinecone import Pinecone
-from typing import List, Dict, Optional, Any
+# Logika untuk integrasi dengan OpenAI (untuk jawaban) dan vector store (Pinecone / lokal) untuk RAG
+from openai import AsyncOpenAI, RateLimitError
+import httpx
+from typing import AsyncIterator, List, Dict, Optional, Any
 import os
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.vector_store import VectorStore, create_vector_store
+from app.utils.singleflight import SingleFlight
+import hashlib
+import json
 import logging
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+LLM_ERROR_MESSAGE = "Maaf, saya mengalami kendala teknis. Silakan coba lagi dalam beberapa saat."
+
 class LLMService:
     def __init__(self):
-        # === OpenAI ===
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-        # === Pinecone v5 (serverless/PC2) ===
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index = None
-        self.pinecone_mode = None  # "v5-host" | "v5-name" | None
-
-        index_name: Optional[str] = getattr(settings, "PINECONE_INDEX_NAME", None)
-        # PENTING: host TANPA "https://"
-        index_host: Optional[str] = getattr(settings, "PINECONE_INDEX_HOST", None)
-
+        # === OpenAI (async, pool koneksi dipakai bersama semua request) ===
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(
+                settings.OPENAI_TIMEOUT_SECONDS,
+                connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+        self.openai_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=self.http_client,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+        )
+
+        # === Vector store: Pinecone v5 (serverless/PC2) atau lokal (NumPy) ===
         try:
-            if index_host:
-                host = index_host.replace("https://", "").strip()
-                self.index = self.pc.Index(host=host)
-                self.pinecone_mode = "v5-host"
-                logger.info(f"Connected to Pinecone by HOST: {host}")
-            elif index_name:
-                # Coba resolve host dari controller → lalu konek by host
-                try:
-                    details = self.pc.describe_index(index_name)
-                    host = getattr(details, "host", None)
-                    if host is None and isinstance(details, dict):
-                        host = details.get("host")
-                    if host:
-                        self.index = self.pc.Index(host=host)
-                        self.pinecone_mode = "v5-host"
-                        logger.info(f"Connected to Pinecone by RESOLVED HOST: {host}")
-                    else:
-                        # Fallback: biarkan SDK resolve by name
-                        self.index = self.pc.Index(index_name)
-                        self.pinecone_mode = "v5-name"
-                        logger.info(f"Connected to Pinecone by NAME: {index_name}")
-                except Exception as e:
-                    # Fallback langsung by name
-                    self.index = self.pc.Index(index_name)
-                    self.pinecone_mode = "v5-name"
-                    logger.warning(f"Host resolve failed, using name='{index_name}': {e}")
-            else:
-                logger.error("Pinecone index is not configured (no INDEX_HOST or INDEX_NAME).")
+            self.store: Optional[VectorStore] = create_vector_store()
         except Exception as e:
-            logger.error(f"Failed to connect to Pinecone index: {e}")
-            self.index = None
+            logger.error(f"Failed to initialise vector store: {e}")
+            self.store = None
+
+        # Jeda bersama saat kena rate limit embedding (semua batch ikut menunggu)
+        self._embed_cooldown_until = 0.0
+        # Ringkasan upsert terakhir (dibaca oleh RAGIngestionService)
+        self.last_upsert_report: Dict[str, Any] = {}
+
+        # Panggilan identik yang bersamaan (embedding / search / generate) cukup jalan sekali
+        self._flights = {
+            "embedding": SingleFlight("embedding"),
+            "search": SingleFlight("search"),
+            "generate": SingleFlight("generate"),
+        }
+
+        # === Cache embedding di disk (opsional) ===
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            try:
+                self.embedding_cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH,
+                    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                )
+            except Exception as e:
+                logger.warning(f"Embedding cache disabled: {e}")
     
+    @property
+    def index_available(self) -> bool:
+        return bool(self.store and self.store.available)
+
     # ========= Embedding =========
+    # Cache embedding = SQLite (blocking) → selalu lewat thread supaya event loop tidak ikut menunggu disk
+    async def _cache_get(self, model: str, text: str) -> Optional[List[float]]:
+        if not self.embedding_cache:
+            return None
+        try:
+            return await asyncio.to_thread(self.embedding_cache.get, model, text)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return None
+
+    async def _cache_put_many(self, model: str, items: List[tuple]) -> None:
+        if not self.embedding_cache:
+            return
+        try:
+            await asyncio.to_thread(self.embedding_cache.put_many, model, items)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
     async def create_embedding(self, text: str) -> List[float]:
-        """Create text embedding using OpenAI"""
+        """Create text embedding using OpenAI (cek cache disk dulu)"""
+        model = settings.OPENAI_EMBEDDING_MODEL
+        key = (model, EmbeddingCache.normalize(text))
+        return await self._flights["embedding"].do(key, lambda: self._create_embedding(model, text))
+
+    async def _create_embedding(self, model: str, text: str) -> List[float]:
         try:
-            response = self.openai_client.embeddings.create(
-                model=settings.OPENAI_EMBEDDING_MODEL,  # pastikan dim=1536 utk index kamu
-                input=text.strip()
+            cached = await self._cache_get(model, text)
+            if cached:
+                return cached
+
+            response = await self.openai_client.embeddings.create(
+                model=model,  # pastikan dim=1536 utk index kamu
+                input=text.strip(),
+                timeout=settings.OPENAI_EMBEDDING_TIMEOUT_SECONDS,
             )
             emb = response.data[0].embedding
             # (opsional) sanity check dimensi:
             # if len(emb) != 1536: logger.warning(f"Unexpected embedding dim: {len(emb)}")
+            if emb:
+                await self._cache_put_many(model, [(text, emb)])
             return emb
         except Exception as e:
             logger.error(f"Error creating embedding: {e}")
             return []
 
+    async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embedding banyak teks sekaligus: dipecah per OPENAI_EMBEDDING_BATCH_SIZE input,
+        batch dikirim paralel (maks OPENAI_EMBEDDING_CONCURRENCY), dan saat kena 429
+        semua batch menunggu jeda yang sama (pakai header Retry-After bila ada).
+        Hasil sejajar dengan input; teks yang gagal → list kosong.
+        """
+        results: List[List[float]] = [[] for _ in texts]
+        todo = [(i, (t or "").strip()) for i, t in enumerate(texts) if (t or "").strip()]
+        if not todo:
+            return results
+
+        model = settings.OPENAI_EMBEDDING_MODEL
+        if self.embedding_cache:
+            try:
+                cached = await asyncio.to_thread(
+                    self.embedding_cache.get_many, model, [t for _, t in todo]
+                )
+                for (i, _), vec in zip(todo, cached):
+                    if vec:
+                        results[i] = vec
+                todo = [(i, t) for (i, t), vec in zip(todo, cached) if not vec]
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+            if not todo:
+                return results
+
+        size = max(1, settings.OPENAI_EMBEDDING_BATCH_SIZE)
+        batches = [todo[i:i + size] for i in range(0, len(todo), size)]
+        sem = asyncio.Semaphore(max(1, settings.OPENAI_EMBEDDING_CONCURRENCY))
+
+        async def _request(batch: List[tuple]):
+            # slot concurrency hanya dipegang selama request berjalan; jeda cooldown ditunggu di luar slot
+            while True:
+                wait = self._embed_cooldown_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                async with sem:
+                    if self._embed_cooldown_until > time.monotonic():
+                        continue  # cooldown dimulai batch lain selama menunggu slot
+                    return await self.openai_client.embeddings.create(
+                        model=model,
+                        input=[t for _, t in batch],
+                        timeout=settings.OPENAI_EMBEDDING_TIMEOUT_SECONDS,
+                    )
+
+        async def _embed_batch(batch_no: int, batch: List[tuple]):
+            retries = settings.OPENAI_EMBEDDING_BATCH_RETRIES
+            for attempt in range(1, retries + 1):
+                try:
+                    response = await _request(batch)
+                    for item in response.data:
+                        results[batch[item.index][0]] = item.embedding
+                    await self._cache_put_many(model, [(t, results[i]) for i, t in batch])
+                    return
+                except RateLimitError as e:
+                    retry_after = None
+                    try:
+                        retry_after = float(e.response.headers.get("retry-after"))
+                    except (TypeError, ValueError, AttributeError):
+                        pass
+                    delay = retry_after if retry_after else min(30.0, 2.0 ** attempt)
+                    self._embed_cooldown_until = max(self._embed_cooldown_until, time.monotonic() + delay)
+                    logger.warning(f"Embedding batch {batch_no} rate limited, retry in {delay:.1f}s (attempt {attempt})")
+                except Exception as e:
+                    logger.warning(f"Embedding batch {batch_no} failed (attempt {attempt}): {e}")
+                    if attempt < retries:
+                        await asyncio.sleep(min(30.0, 2.0 ** attempt))
+            logger.error(f"Embedding batch {batch_no} gave up after {retries} attempts")
+
+        await asyncio.gather(*(_embed_batch(n, b) for n, b in enumerate(batches)))
+        return results
+
     # ========= RAG Search =========
     async def search_knowledge_base(
         self,
@@ -79,30 +197,56 @@ class LLMService:
         top_k: int = 3,
         min_score: float = 0.50,
         prefer_doc_key: Optional[List[str]] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
-        if not self.index:
-            logger.warning("Pinecone index not available")
+        """
+        Cari chunk KB paling mirip dengan query.
+        - metadata_filter: filter gaya Pinecone (mis. {"doc_key": {"$in": [...]}}) yang
+          dijalankan di vector store → hasil hanya dari dokumen yang dituju (top_k jangan
+          lebih kecil dari jumlah chunk dokumen itu bila semua chunk dibutuhkan)
+        - prefer_doc_key : re-rank hasil (urutan grup doc_key, lalu score)
+        - query_embedding: embedding query yang sudah dihitung pemanggil (tidak di-embed ulang)
+        """
+        if not self.index_available:
+            logger.warning("Vector index not available")
             return []
 
+        key = (
+            EmbeddingCache.normalize(query), top_k, float(min_score),
+            tuple(prefer_doc_key or ()),
+            json.dumps(metadata_filter, sort_keys=True, default=str) if metadata_filter else None,
+        )
+        results = await self._flights["search"].do(
+            key, lambda: self._search(query, top_k, min_score, prefer_doc_key, metadata_filter, query_embedding)
+        )
+        # hasil bisa dipakai bersama beberapa request → beri salinan per pemanggil
+        return [dict(r) for r in results]
+
+    async def _search(
+        self,
+        query: str,
+        top_k: int,
+        min_score: float,
+        prefer_doc_key: Optional[List[str]],
+        metadata_filter: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]],
+    ) -> List[Dict[str, Any]]:
         try:
-            query_embedding = await self.create_embedding(query)
+            if not query_embedding:
+                query_embedding = await self.create_embedding(query)
             if not query_embedding:
                 return []
 
             namespace = getattr(settings, "PINECONE_NAMESPACE", "") or ""
-            res = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                namespace=namespace,
-                include_metadata=True,
+            matches = await self.store.query(
+                query_embedding, top_k=top_k, namespace=namespace, filter=metadata_filter
             )
-
-            matches = res.get("matches", []) if isinstance(res, dict) else getattr(res, "matches", []) or []
             results: List[Dict[str, Any]] = []
 
             for m in matches:
-                meta = m.get("metadata") if isinstance(m, dict) else getattr(m, "metadata", None)
-                score = m.get("score") if isinstance(m, dict) else getattr(m, "score", None)
+                meta = m.get("metadata")
+                score = m.get("score")
                 if not meta:
                     continue
                 if (score is not None) and (float(score) < float(min_score)):
@@ -110,6 +254,7 @@ class LLMService:
 
                 # ambil semua metadata penting; pakai 'text' jika ada agar konten tidak kependekan
                 row = {
+                    "id": m.get("id"),
                     "content": meta.get("text") or meta.get("content", ""),
                     "title": meta.get("title", ""),
                     "source": meta.get("source", ""),
@@ -139,15 +284,31 @@ class LLMService:
 
     async def clear_namespace(self, namespace: Optional[str] = None) -> dict:
         """Hapus semua vektor di namespace (untuk re-ingest bersih)."""
-        if not self.index:
+        if not self.index_available:
             return {"ok": False, "error": "Index not available"}
         ns = namespace if namespace is not None else (getattr(settings, "PINECONE_NAMESPACE", "") or "")
         try:
-            self.index.delete(delete_all=True, namespace=ns)
+            await self.store.delete_all(ns)
             return {"ok": True, "namespace": ns}
         except Exception as e:
             logger.error(f"Error clearing namespace '{ns}': {e}")
             return {"ok": False, "namespace": ns, "error": str(e)}
+
+    async def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> dict:
+        """Hapus vektor berdasarkan ID (per 1000 ID, batas API Pinecone)."""
+        if not self.index_available:
+            return {"ok": False, "deleted": 0, "error": "Index not available"}
+        ns = namespace if namespace is not None else (getattr(settings, "PINECONE_NAMESPACE", "") or "")
+        deleted = 0
+        try:
+            for i in range(0, len(ids), 1000):
+                part = ids[i:i + 1000]
+                await self.store.delete(part, ns)
+                deleted += len(part)
+            return {"ok": True, "namespace": ns, "deleted": deleted}
+        except Exception as e:
+            logger.error(f"Error deleting vectors in '{ns}': {e!r}")
+            return {"ok": False, "namespace": ns, "deleted": deleted, "error": str(e)}
     # ========= LLM Generate =========
     async def generate_response(
         self,
@@ -158,21 +319,24 @@ class LLMService:
     ) -> str:
         """Generate response using GPT-4o mini with RAG context"""
         try:
-            system_prompt = self._build_system_prompt(knowledge_context, strict=strict)  # ⬅️ pass strict
-            messages = [{"role": "system", "content": system_prompt}]
-
-            # Catatan: dalam STRICT mode, kita sengaja tidak bawa terlalu banyak history
-            if conversation_context and not strict:
-                messages.extend(conversation_context[-6:])  # last 3 exchanges
-
-            messages.append({"role": "user", "content": user_query})
+            messages = self._build_messages(user_query, conversation_context, knowledge_context, strict)
+            key = hashlib.sha1(
+                json.dumps([settings.OPENAI_MODEL, strict, messages], ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+        except Exception as e:
+            logger.error(f"Error building LLM prompt: {e}")
+            return LLM_ERROR_MESSAGE
+        return await self._flights["generate"].do(key, lambda: self._generate(messages, strict))
 
-            response = self.openai_client.chat.completions.create(
+    async def _generate(self, messages: List[Dict[str, str]], strict: bool) -> str:
+        try:
+            response = await self.openai_client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=messages,
                 temperature=0 if strict else 0.7,          # ⬅️ kunci: deterministic
                 top_p=1.0,
                 max_tokens=800,
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
             )
             answer = response.choices[0].message.content.strip()
 
@@ -181,7 +345,56 @@ class LLMService:
 
         except Exception as e:
             logger.error(f"Error generating LLM response: {e}")
-            return "Maaf, saya mengalami kendala teknis. Silakan coba lagi dalam beberapa saat."
+            return LLM_ERROR_MESSAGE
+
+    async def stream_response(
+        self,
+        user_query: str,
+        conversation_context: Optional[List[Dict]] = None,
+        knowledge_context: Optional[List[Dict]] = None,
+        strict: bool = False,
+    ) -> AsyncIterator[str]:
+        """Sama seperti generate_response, tapi meneruskan potongan teks begitu diterima dari model."""
+        sent = False
+        try:
+            messages = self._build_messages(user_query, conversation_context, knowledge_context, strict)
+            stream = await self.openai_client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=0 if strict else 0.7,
+                top_p=1.0,
+                max_tokens=800,
+                stream=True,
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    sent = True
+                    yield delta
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}")
+            prefix = "\n\n" if sent else ""
+            yield prefix + LLM_ERROR_MESSAGE
+
+    def _build_messages(
+        self,
+        user_query: str,
+        conversation_context: Optional[List[Dict]] = None,
+        knowledge_context: Optional[List[Dict]] = None,
+        strict: bool = False,
+    ) -> List[Dict[str, str]]:
+        system_prompt = self._build_system_prompt(knowledge_context, strict=strict)  # ⬅️ pass strict
+        messages = [{"role": "system", "content": system_prompt}]
+
+        # Catatan: dalam STRICT mode, kita sengaja tidak bawa terlalu banyak history
+        if conversation_context and not strict:
+            messages.extend(conversation_context[-6:])  # last 3 exchanges
+
+        messages.append({"role": "user", "content": user_query})
+        return messages
 
 
     def _build_system_prompt(
@@ -228,21 +441,25 @@ class LLMService:
     # ========= Upsert (minimal metadata) =========
     async def upsert_knowledge(self, documents: List[Dict[str, Any]]) -> bool:
         """Upsert documents to Pinecone knowledge base (lean metadata)."""
-        if not self.index:
-            logger.warning("Pinecone index not available for upserting")
+        if not self.index_available:
+            logger.warning("Vector index not available for upserting")
             return False
 
+        self.last_upsert_report = {}
         try:
             vectors_to_upsert = []
+            skipped_ids: List[str] = []
             namespace = getattr(settings, "PINECONE_NAMESPACE", "") or ""
 
-            for i, doc in enumerate(documents):
-                content = (doc.get("content") or "").strip()
+            # embedding sekali jalan per batch (bukan satu round trip per chunk)
+            contents = [(doc.get("content") or "").strip() for doc in documents]
+            embeddings = await self.create_embeddings(contents)
+
+            for i, (doc, content, emb) in enumerate(zip(documents, contents, embeddings)):
                 if not content:
                     continue
-
-                emb = await self.create_embedding(content)
                 if not emb:
+                    skipped_ids.append(doc.get("id", f"doc_{i}"))
                     continue
 
                 # ❗️Sengaja TIDAK menyalin semua field doc → metadata dibuat eksplisit & ringan
@@ -252,6 +469,9 @@ class LLMService:
                     "source":  doc.get("source", ""),
                     "section": doc.get("section", ""),           # opsional tapi berguna
                 }
+                # doc_key dipakai sebagai filter metadata saat query (Pinecone menolak nilai null)
+                if doc.get("doc_key"):
+                    meta["doc_key"] = doc["doc_key"]
 
                 vectors_to_upsert.append({
                     "id": doc.get("id", f"doc_{i}"),
@@ -260,24 +480,65 @@ class LLMService:
                 })
 
             if not vectors_to_upsert:
+                self.last_upsert_report = {
+                    "upserted": 0, "batches": 0, "failed_batches": 0,
+                    "failed_ids": skipped_ids, "embedding_failures": len(skipped_ids),
+                }
                 return False
 
-            self.index.upsert(vectors=vectors_to_upsert, namespace=namespace)
-            logger.info(f"Successfully upserted {len(vectors_to_upsert)} documents (ns='{namespace}')")
-            return True
+            report = await self._upsert_batches(vectors_to_upsert, namespace)
+            report["embedding_failures"] = len(skipped_ids)
+            report["failed_ids"] += skipped_ids
+            self.last_upsert_report = report
+            logger.info(
+                f"Upserted {report['upserted']}/{len(vectors_to_upsert)} documents in {report['batches']} batches "
+                f"(failed batches: {report['failed_batches']}, ns='{namespace}')"
+            )
+            return report["failed_batches"] == 0 and report["embedding_failures"] == 0
 
         except Exception as e:
             logger.error(f"Error upserting knowledge: {e}")
             return False
 
+    async def _upsert_batches(self, vectors: List[Dict[str, Any]], namespace: str) -> Dict[str, Any]:
+        """Upsert dalam batch berukuran PINECONE_UPSERT_BATCH_SIZE, paralel terbatas, retry per batch."""
+        size = max(1, settings.PINECONE_UPSERT_BATCH_SIZE)
+        batches = [vectors[i:i + size] for i in range(0, len(vectors), size)]
+        sem = asyncio.Semaphore(max(1, settings.PINECONE_UPSERT_CONCURRENCY))
+
+        async def _send(batch_no: int, batch: List[Dict[str, Any]]) -> bool:
+            async with sem:
+                for attempt in range(1, settings.PINECONE_UPSERT_RETRIES + 1):
+                    try:
+                        await self.store.upsert(
+                            batch,
+                            namespace,
+                            timeout=settings.PINECONE_UPSERT_TIMEOUT_SECONDS,
+                        )
+                        return True
+                    except Exception as e:
+                        logger.warning(f"Upsert batch {batch_no} failed (attempt {attempt}): {e!r}")
+                        if attempt < settings.PINECONE_UPSERT_RETRIES:
+                            await asyncio.sleep(min(10.0, 0.5 * 2 ** attempt))
+                return False
+
+        oks = await asyncio.gather(*(_send(n, b) for n, b in enumerate(batches)))
+        failed = [b for b, ok in zip(batches, oks) if not ok]
+        return {
+            "upserted": sum(len(b) for b, ok in zip(batches, oks) if ok),
+            "batches": len(batches),
+            "failed_batches": len(failed),
+            "failed_ids": [v["id"] for b in failed for v in b],
+        }
+
     # ========= Stats =========
     async def get_index_stats(self) -> Dict[str, Any]:
-        """Get Pinecone index statistics"""
-        if not self.index:
+        """Get vector index statistics"""
+        if not self.index_available:
             return {"error": "Index not available"}
         try:
             ns = getattr(settings, "PINECONE_NAMESPACE", "") or ""
-            stats = self.index.describe_index_stats()
+            stats = await self.store.describe_stats()
             if isinstance(stats, dict):
                 namespaces = stats.get("namespaces") or {}
                 ns_count = (namespaces.get(ns) or {}).get("vector_count", 0)
@@ -294,11 +555,32 @@ class LLMService:
                 "namespace_vectors": {ns: ns_count},
                 "namespaces": namespaces,
                 "dimension": dim or "unknown",
-                "mode": self.pinecone_mode,
+                "mode": self.store.mode,
             }
         except Exception as e:
             logger.error(f"Error getting index stats: {e}")
             return {"error": str(e)}
 
+    # ========= Metrics =========
+    def get_metrics(self) -> Dict[str, Any]:
+        """Metrik runtime (antrean pool Pinecone, dst) untuk endpoint /api/metrics."""
+        return {
+            "vector_store": self.store.metrics() if self.store else None,
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "singleflight": {name: f.stats() for name, f in self._flights.items()},
+        }
+
+    # ========= Lifecycle =========
+    async def aclose(self) -> None:
+        """Tutup pool HTTP OpenAI (dipanggil saat aplikasi shutdown)."""
+        try:
+            await self.openai_client.close()
+        except Exception as e:
+            logger.warning(f"Error closing OpenAI client: {e}")
+        if self.store:
+            self.store.close()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+
 # Singleton instance
 llm_service = LLMService()
@@ -1,62 +1,168 @@
 # Logika untuk mengelola memori percakapan per sesi
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime
+import asyncio
+import logging
+import os
+import time
 import uuid
-from dataclasses import dataclass, asdict
 from app.config import settings
+from app.utils.executor import MeteredExecutor
+from app.services.session_store import (
+    ConversationExchange,
+    SessionContext,
+    SessionStore,
+    create_session_store,
+    decode_session,
+    encode_session,
+    read_snapshot,
+    write_snapshot,
+)
 
-@dataclass
-class ConversationExchange:
-    timestamp: datetime
-    user_message: str
-    bot_response: str
-    intent_type: Optional[str] = None
-    parameters: Optional[Dict] = None
-
-@dataclass
-class SessionContext:
-    session_id: str
-    created_at: datetime
-    last_activity: datetime
-    current_topic: Optional[str] = None
-    pending_intent: Optional[str] = None  # For clarification flow
-    pending_parameters: Optional[Dict] = None
-    exchanges: List[ConversationExchange] = None
-    
-    def __post_init__(self):
-        if self.exchanges is None:
-            self.exchanges = []
+logger = logging.getLogger(__name__)
+
+class SessionHandle:
+    """
+    Sesi yang di-resolve sekali per request (satu lookup store, satu baca jam, satu cek expiry).
+    Mutasi hanya mengubah objek sesi lokal; commit() menulis aktivitas, exchange dan pending
+    clarification ke store dalam satu tulis (store eksternal: satu round trip per request).
+
+    Sesi lama ditulis dengan store.update → bila sesi dihapus selama request berjalan
+    (/api/session/clear, sweeper, eviksi), commit tidak menghidupkannya lagi. Selain itu
+    last-writer-wins: request bersamaan untuk sesi yang sama (mis. worker lain saat panggilan
+    LLM berjalan) saling menimpa seluruh isi sesi, termasuk exchange dan pending clarification.
+    """
+
+    __slots__ = ("manager", "session", "now", "created", "_committed")
+
+    def __init__(self, manager: "MemoryManager", session: SessionContext, now: float, created: bool):
+        self.manager = manager
+        self.session = session
+        self.now = now
+        self.created = created
+        self._committed = False
+
+    @property
+    def id(self) -> str:
+        return self.session.session_id
+
+    def get_pending_clarification(self) -> Optional[tuple]:
+        if self.session.pending_intent:
+            return self.session.pending_intent, self.session.pending_parameters
+        return None
+
+    def set_pending_clarification(self, intent: str, parameters: Dict = None):
+        self.session.pending_intent = intent
+        self.session.pending_parameters = parameters or {}
+
+    def clear_pending_clarification(self):
+        self.session.pending_intent = None
+        self.session.pending_parameters = None
+
+    def add_exchange(self, user_message: str, bot_response: str,
+                     intent_type: Optional[str] = None, parameters: Optional[Dict] = None):
+        self.session.exchanges.append(ConversationExchange(
+            timestamp=self.now,
+            user_message=user_message,
+            bot_response=bot_response,
+            intent_type=intent_type,
+            parameters=parameters or None
+        ))
+
+    def get_conversation_context(self) -> List[Dict]:
+        return self.manager._context(self.session)
+
+    async def commit(self) -> bool:
+        """Tulis sesi ke store (sekali per request); False bila sesi sudah dihapus di tengah request."""
+        if self._committed:
+            return False
+        self._committed = True
+        self.session.last_activity = self.now
+        if self.manager.pool is None:
+            return self._write()
+        # shield: request dibatalkan (client putus di tengah stream) → penulisan di thread tetap jalan
+        return await asyncio.shield(self.manager.run(self._write))
+
+    def _write(self) -> bool:
+        if self.created:
+            self.manager.store.put(self.session)
+            return True
+        if not self.manager.store.update(self.session):
+            logger.debug(f"Session {self.id} removed during request, not saved")
+            return False
+        return True
 
 class MemoryManager:
-    def __init__(self):
-        self.sessions: Dict[str, SessionContext] = {}
+    def __init__(self, store: Optional[SessionStore] = None):
+        # Store sesi: memory (per proses) atau sqlite (dibagi antar worker uvicorn)
+        self.store = store or create_session_store(
+            settings.SESSION_STORE, settings.SESSION_SQLITE_PATH, max_live=settings.SESSION_MAX_LIVE
+        )
+        # Store blocking (sqlite: bisa menunggu lock WAL worker lain) → operasinya lewat pool thread
+        # sendiri supaya event loop (termasuk stream SSE) tidak ikut menunggu
+        self.pool: Optional[MeteredExecutor] = MeteredExecutor(
+            "sessions", max_workers=settings.SESSION_STORE_MAX_WORKERS
+        ) if self.store.blocking else None
         self.timeout_minutes = settings.SESSION_TIMEOUT_MINUTES
+        self.timeout_seconds = self.timeout_minutes * 60
         self.max_exchanges = settings.MAX_MEMORY_EXCHANGES
+        # Sweeper background: buang sesi kedaluwarsa + sesi di atas SESSION_MAX_LIVE
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.last_sweep_ms: Optional[float] = None
+        # Snapshot sesi ke file (store memory): berkala + saat shutdown, dipulihkan saat startup
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._snapshot_writes = -1
+        self.last_snapshot: Optional[Dict[str, Any]] = None
+        self.last_restore: Optional[Dict[str, Any]] = None
     
     def create_session(self) -> str:
         """Create new session and return session ID"""
         session_id = str(uuid.uuid4())
-        now = datetime.now()
+        now = time.time()
         
-        self.sessions[session_id] = SessionContext(
+        self.store.put(SessionContext(
             session_id=session_id,
             created_at=now,
             last_activity=now,
-            exchanges=[]
-        )
+        ))
         
         return session_id
     
+    async def run(self, fn, *args):
+        """Panggil fungsi sync yang menyentuh store dari event loop (pool thread bila store blocking)."""
+        if self.pool is None:
+            return fn(*args)
+        return await self.pool.run(fn, *args)
+
+    async def open_session(self, session_id: Optional[str]) -> SessionHandle:
+        """
+        Handle sesi untuk satu request: sesi aktif dengan id tsb, atau sesi baru bila tidak ada /
+        kedaluwarsa. Perubahan baru tersimpan setelah await handle.commit().
+        """
+        return await self.run(self._open_session, session_id)
+
+    def _open_session(self, session_id: Optional[str]) -> SessionHandle:
+        now = time.time()
+        session = self.store.get(session_id) if session_id else None
+        if session is not None and session.last_activity < now - self.timeout_seconds:
+            self.store.delete(session_id)
+            session = None
+        if session is not None:
+            return SessionHandle(self, session, now, created=False)
+        session = SessionContext(session_id=str(uuid.uuid4()), created_at=now, last_activity=now)
+        return SessionHandle(self, session, now, created=True)
+
     def get_session(self, session_id: str) -> Optional[SessionContext]:
         """Get session by ID, check if still active"""
-        if session_id not in self.sessions:
+        if not session_id:
+            return None
+        session = self.store.get(session_id)
+        if session is None:
             return None
-        
-        session = self.sessions[session_id]
         
         # Check if session expired
-        timeout_threshold = datetime.now() - timedelta(minutes=self.timeout_minutes)
-        if session.last_activity < timeout_threshold:
+        if session.last_activity < time.time() - self.timeout_seconds:
             self.cleanup_session(session_id)
             return None
         
@@ -66,7 +172,8 @@ class MemoryManager:
         """Update last activity timestamp"""
         session = self.get_session(session_id)
         if session:
-            session.last_activity = datetime.now()
+            session.last_activity = time.time()
+            self.store.put(session)
             return True
         return False
     
@@ -77,21 +184,18 @@ class MemoryManager:
         if not session:
             return False
         
-        exchange = ConversationExchange(
-            timestamp=datetime.now(),
+        now = time.time()
+        # exchanges = ring buffer max_exchanges → exchange tertua tertimpa otomatis
+        session.exchanges.append(ConversationExchange(
+            timestamp=now,
             user_message=user_message,
             bot_response=bot_response,
             intent_type=intent_type,
-            parameters=parameters
-        )
-        
-        session.exchanges.append(exchange)
+            parameters=parameters or None
+        ))
         
-        # Keep only recent exchanges
-        if len(session.exchanges) > self.max_exchanges:
-            session.exchanges = session.exchanges[-self.max_exchanges:]
-        
-        self.update_session_activity(session_id)
+        session.last_activity = now
+        self.store.put(session)
         return True
     
     def set_pending_clarification(self, session_id: str, intent: str, parameters: Dict = None):
@@ -100,7 +204,8 @@ class MemoryManager:
         if session:
             session.pending_intent = intent
             session.pending_parameters = parameters or {}
-            self.update_session_activity(session_id)
+            session.last_activity = time.time()
+            self.store.put(session)
     
     def get_pending_clarification(self, session_id: str) -> Optional[tuple]:
         """Get pending clarification data"""
@@ -115,14 +220,18 @@ class MemoryManager:
         if session:
             session.pending_intent = None
             session.pending_parameters = None
-            self.update_session_activity(session_id)
+            session.last_activity = time.time()
+            self.store.put(session)
     
     def get_conversation_context(self, session_id: str) -> List[Dict]:
         """Get recent conversation context for LLM"""
         session = self.get_session(session_id)
         if not session:
             return []
-        
+        return self._context(session)
+
+    @staticmethod
+    def _context(session: SessionContext) -> List[Dict]:
         context = []
         for exchange in session.exchanges:
             context.extend([
@@ -132,35 +241,163 @@ class MemoryManager:
         
         return context
     
-    def cleanup_session(self, session_id: str):
+    def cleanup_session(self, session_id: str) -> bool:
         """Remove session from memory"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        return self.store.delete(session_id)
     
     def cleanup_expired_sessions(self):
         """Clean up all expired sessions"""
-        now = datetime.now()
-        timeout_threshold = now - timedelta(minutes=self.timeout_minutes)
-        
-        expired_sessions = [
-            sid for sid, session in self.sessions.items()
-            if session.last_activity < timeout_threshold
-        ]
-        
-        for sid in expired_sessions:
-            self.cleanup_session(sid)
-        
-        return len(expired_sessions)
+        return self.store.purge_expired(time.time() - self.timeout_seconds)
     
     def get_session_stats(self) -> Dict:
         """Get memory statistics"""
         now = datetime.now()
-        active_sessions = len(self.sessions)
+        active_sessions = self.store.count()
         
         return {
             "active_sessions": active_sessions,
             "timestamp": now.isoformat()
         }
 
+    def sweep(self) -> Dict[str, int]:
+        """Satu putaran sweeper: sesi kedaluwarsa lalu kelebihan di atas SESSION_MAX_LIVE."""
+        started = time.perf_counter()
+        expired = self.cleanup_expired_sessions()
+        evicted = self.store.enforce_limit()
+        self.sweeps += 1
+        self.last_sweep_ms = round((time.perf_counter() - started) * 1000, 3)
+        return {"expired": expired, "evicted": evicted}
+
+    def start_sweeper(self) -> None:
+        """Jalankan sweep() berkala di background (dipanggil saat startup)."""
+        if self._sweeper_task or settings.SESSION_SWEEP_INTERVAL_SECONDS <= 0:
+            return
+
+        async def _loop():
+            while True:
+                await asyncio.sleep(settings.SESSION_SWEEP_INTERVAL_SECONDS)
+                try:
+                    result = await self.run(self.sweep)
+                    if result["expired"] or result["evicted"]:
+                        logger.info(f"Session sweep: {result} ({self.last_sweep_ms} ms)")
+                except Exception as e:
+                    logger.error(f"Session sweep failed: {e}")
+
+        self._sweeper_task = asyncio.get_running_loop().create_task(_loop())
+
+    # ---------------- Persistensi (snapshot file) ----------------
+    def _persistence_enabled(self) -> bool:
+        # store sqlite sudah persisten sendiri
+        return bool(settings.SESSION_SNAPSHOT_PATH) and self.store.backend == "memory"
+
+    def save_snapshot(self, sessions: Optional[List[SessionContext]] = None,
+                      writes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tulis sesi hidup ke SESSION_SNAPSHOT_PATH, yang terbaru dulu (sesi kedaluwarsa tidak ikut).
+        sessions/writes = hasil store.snapshot() + store.writes yang diambil bersamaan oleh pemanggil.
+        """
+        if not self._persistence_enabled():
+            return None
+        started = time.perf_counter()
+        if sessions is None:
+            writes, sessions = self.store.writes, self.store.snapshot()
+        threshold = time.time() - self.timeout_seconds
+        count, size = write_snapshot(
+            settings.SESSION_SNAPSHOT_PATH,
+            ((s.last_activity, encode_session(s)) for s in reversed(sessions) if s.last_activity >= threshold),
+        )
+        if writes is not None:
+            self._snapshot_writes = writes
+        self.last_snapshot = {
+            "at": time.time(),
+            "sessions": count,
+            "bytes": size,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        return self.last_snapshot
+
+    def restore_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Muat sesi dari snapshot saat startup. Sesi kedaluwarsa dilewati tanpa decode;
+        melewati SESSION_RESTORE_MAX_SECONDS → sisanya (yang paling lama tidak aktif) dilewati.
+        """
+        if not self._persistence_enabled() or not os.path.exists(settings.SESSION_SNAPSHOT_PATH):
+            return None
+        started = time.perf_counter()
+        deadline = started + settings.SESSION_RESTORE_MAX_SECONDS
+        threshold = time.time() - self.timeout_seconds
+        restored: List[SessionContext] = []
+        skipped = {"expired": 0, "deadline": 0, "corrupt": 0}
+        try:
+            for last_activity, payload in read_snapshot(settings.SESSION_SNAPSHOT_PATH):
+                if last_activity < threshold:
+                    skipped["expired"] += 1
+                elif time.perf_counter() > deadline:
+                    skipped["deadline"] += 1
+                else:
+                    try:
+                        restored.append(decode_session(payload))
+                    except (ValueError, TypeError):
+                        skipped["corrupt"] += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"Session snapshot restore failed: {e}")
+        # file urut terbaru dulu; put dari yang terlama → urutan LRU store tetap benar
+        for session in reversed(restored):
+            self.store.put(session)
+        self._snapshot_writes = self.store.writes
+        self.last_restore = {
+            "restored": len(restored),
+            "skipped": skipped,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        logger.info(f"Session snapshot restored: {self.last_restore}")
+        return self.last_restore
+
+    def start_snapshots(self) -> None:
+        """Tulis snapshot berkala di background (hanya bila ada sesi yang berubah)."""
+        if self._snapshot_task or not self._persistence_enabled() or settings.SESSION_SNAPSHOT_INTERVAL_SECONDS <= 0:
+            return
+
+        async def _loop():
+            while True:
+                await asyncio.sleep(settings.SESSION_SNAPSHOT_INTERVAL_SECONDS)
+                if self.store.writes == self._snapshot_writes:
+                    continue
+                try:
+                    # salinan sesi dibuat di event loop (handler tidak sedang memutasi),
+                    # encode + tulis file di thread
+                    writes, sessions = self.store.writes, self.store.snapshot()
+                    await asyncio.to_thread(self.save_snapshot, sessions, writes)
+                except Exception as e:
+                    logger.error(f"Session snapshot failed: {e}")
+
+        self._snapshot_task = asyncio.get_running_loop().create_task(_loop())
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "sweeps": self.sweeps,
+            "last_sweep_ms": self.last_sweep_ms,
+            "sweep_interval_seconds": settings.SESSION_SWEEP_INTERVAL_SECONDS,
+            "pool": self.pool.stats() if self.pool else None,
+            "store": self.store.stats(),
+            "persistence": {
+                "enabled": self._persistence_enabled(),
+                "last_snapshot": self.last_snapshot,
+                "last_restore": self.last_restore,
+            },
+        }
+
+    def close(self) -> None:
+        for task in (self._sweeper_task, self._snapshot_task):
+            if task:
+                task.cancel()
+        if self.pool:
+            self.pool.shutdown(wait=True)  # operasi yang sedang jalan selesai dulu sebelum koneksi ditutup
+        try:
+            self.save_snapshot()  # shutdown normal → sesi ikut ke deploy berikutnya
+        except Exception as e:
+            logger.error(f"Session snapshot on shutdown failed: {e}")
+        self.store.close()
+
 # Singleton instance
 memory_manager = MemoryManager()
\ No newline at end of file
@@ -5,6 +5,8 @@ RAG Ingestion Service
 - Ekstrak title & section berdasarkan heading (#, ##, ###)
 - Chunking berbasis paragraf dengan overlap ringan (tanpa tiktoken)
 - Upsert ke Pinecone lewat llm_service.upsert_knowledge()
+- Inkremental: manifest (hash file + chunk ID) → hanya file berubah yang diproses,
+  chunk ID basi dihapus dari namespace
 - Retrieval test lewat llm_service.search_knowledge_base()
 
 Catatan:
@@ -14,8 +16,11 @@ Catatan:
 
 from __future__ import annotations
 
+import fnmatch
 import hashlib
+import json
 import logging
+import os
 import re
 from dataclasses import dataclass
 from datetime import datetime
@@ -35,9 +40,16 @@ class _Chunk:
     estimated_tokens: int
 
 
+# Naikkan bila bentuk metadata/ID berubah → run berikutnya otomatis full re-ingest
+# 2: metadata menyimpan doc_key (filterable)
+MANIFEST_SCHEMA = 2
+
+
 class RAGIngestionService:
     def __init__(self):
         self.knowledge_base_path = Path("data/knowledge_base")
+        self.manifest_path = Path(settings.KB_MANIFEST_PATH)
+        self._version_cache: tuple = (None, None)  # (mtime manifest, versi)
         # Target ukuran chunk (konversi kasar 1 token ~ 4 karakter)
         self.min_tokens = 500
         self.max_tokens = 800
@@ -319,11 +331,80 @@ class RAGIngestionService:
         logger.info(f"Processed {file_path.name}: {len(docs)} chunks")
         return docs
 
+    # ---------------- Manifest ----------------
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {
+            "schema": MANIFEST_SCHEMA,
+            "vector_store": settings.VECTOR_STORE_BACKEND,
+            "namespace": settings.PINECONE_NAMESPACE,
+            "embedding_model": settings.OPENAI_EMBEDDING_MODEL,
+            "version": None,
+            "files": {},
+            "pending_delete": [],
+        }
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Baca manifest; kalau tidak ada / skema-namespace-model beda → manifest kosong (full ingest)."""
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return self._empty_manifest()
+        except Exception as e:
+            logger.warning(f"Manifest tidak terbaca, full ingest: {e}")
+            return self._empty_manifest()
+
+        if (data.get("schema") != MANIFEST_SCHEMA
+                or data.get("vector_store") != settings.VECTOR_STORE_BACKEND
+                or data.get("namespace") != settings.PINECONE_NAMESPACE
+                or data.get("embedding_model") != settings.OPENAI_EMBEDDING_MODEL):
+            logger.info("Manifest tidak cocok (schema/backend/namespace/model berubah) → full ingest")
+            return self._empty_manifest()
+        data.setdefault("files", {})
+        data.setdefault("pending_delete", [])
+        return data
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Tulis atomik (tmp + rename) supaya crash di tengah tidak merusak manifest."""
+        all_ids = sorted(i for f in manifest["files"].values() for i in f.get("chunk_ids", []))
+        manifest["version"] = hashlib.sha1("\n".join(all_ids).encode("utf-8")).hexdigest()[:16]
+        manifest["updated_at"] = datetime.now().isoformat()
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def reset_manifest(self) -> None:
+        """Lupakan state ingestion (mis. setelah llm_service.clear_namespace)."""
+        try:
+            self.manifest_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def kb_version(self) -> Optional[str]:
+        """Versi KB dari manifest (hash chunk ID); dibaca ulang hanya bila file manifest berubah."""
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except OSError:
+            return None
+        cached_mtime, version = self._version_cache
+        if cached_mtime != mtime:
+            version = self._load_manifest().get("version")
+            self._version_cache = (mtime, version)
+        return version
+
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
     # ---------------- Public API ----------------
 
-    async def ingest_knowledge_base(self, pattern: str = "*.md") -> Dict[str, Any]:
+    async def ingest_knowledge_base(self, pattern: str = "*.md", full: bool = False) -> Dict[str, Any]:
         """
-        Ingest seluruh file markdown di data/knowledge_base.
+        Ingest file markdown di data/knowledge_base secara inkremental.
+        - File yang hash-nya sama dengan manifest dilewati (tidak di-chunk / di-embed ulang)
+        - Hanya chunk ID baru yang di-upsert; chunk ID lama yang hilang dihapus dari namespace
+        - full=True → abaikan manifest (proses & upsert semua)
         Mengembalikan ringkasan proses dan stats indeks Pinecone.
         """
         if not self.knowledge_base_path.exists():
@@ -332,39 +413,125 @@ class RAGIngestionService:
             return {"success": False, "error": msg, "stats": {}}
 
         files = sorted(self.knowledge_base_path.glob(pattern))
-        if not files:
+        logger.info(f"Found {len(files)} markdown files to process")
+
+        manifest = self._empty_manifest() if full else self._load_manifest()
+        old_files: Dict[str, Any] = manifest["files"]
+        if old_files and not full:
+            # namespace kosong padahal manifest berisi (mis. habis clear_namespace) → full
+            idx_stats = await llm_service.get_index_stats()
+            ns_count = (idx_stats.get("namespace_vectors") or {}).get(settings.PINECONE_NAMESPACE)
+            if ns_count == 0:
+                logger.info("Namespace kosong tapi manifest berisi → full ingest")
+                manifest, old_files = self._empty_manifest(), {}
+
+        # tidak ada file, tapi manifest masih mencatat file yang cocok → semua file dihapus,
+        # lanjut supaya vektornya ikut dihapus
+        if not files and not any(fnmatch.fnmatch(name, pattern) for name in old_files):
             msg = f"No markdown files found in {self.knowledge_base_path}"
             logger.warning(msg)
             return {"success": False, "error": msg, "stats": {}}
 
-        logger.info(f"Found {len(files)} markdown files to process")
-
-        all_docs: List[Dict[str, Any]] = []
+        new_files: Dict[str, Any] = {}
+        to_upsert: List[Dict[str, Any]] = []
+        to_delete: List[str] = list(manifest.get("pending_delete") or [])
+        counts = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        all_docs_count = 0
         processed = 0
+
         for fp in files:
+            try:
+                digest = self._file_hash(fp)
+            except Exception as e:
+                logger.error(f"Gagal membaca {fp}: {e}")
+                continue
+
+            prev = old_files.get(fp.name)
+            if prev and prev.get("sha256") == digest:
+                new_files[fp.name] = prev
+                counts["unchanged"] += 1
+                continue
+
             docs = self._process_file(fp)
-            if docs:
-                all_docs.extend(docs)
-                processed += 1
+            if not docs:
+                continue
+            processed += 1
+            all_docs_count += len(docs)
+            counts["updated" if prev else "added"] += 1
+
+            old_ids = set((prev or {}).get("chunk_ids", []))
+            new_ids = [d["id"] for d in docs]
+            to_upsert.extend(d for d in docs if d["id"] not in old_ids)
+            to_delete.extend(sorted(old_ids - set(new_ids)))
+            new_files[fp.name] = {"sha256": digest, "chunk_ids": new_ids}
+
+        # file yang hilang dari disk (dan cocok dengan pattern) → hapus semua chunk-nya
+        for name, prev in old_files.items():
+            if name in new_files:
+                continue
+            if not fnmatch.fnmatch(name, pattern):
+                new_files[name] = prev  # di luar cakupan run ini, biarkan
+                continue
+            if (self.knowledge_base_path / name).exists():
+                new_files[name] = prev  # file ada tapi gagal diproses → jangan hapus vektornya
+                continue
+            counts["deleted"] += 1
+            to_delete.extend(prev.get("chunk_ids", []))
 
-        if not all_docs:
+        if not new_files and not to_delete:
             return {
                 "success": False,
                 "error": "No valid chunks generated",
                 "stats": {"files_found": len(files), "files_processed": processed},
             }
 
-        logger.info(f"Upserting {len(all_docs)} chunks to Pinecone (ns='{settings.PINECONE_NAMESPACE}')...")
-        ok = await llm_service.upsert_knowledge(all_docs)
+        ok = True
+        upserted = 0
+        if to_upsert:
+            logger.info(f"Upserting {len(to_upsert)} new/changed chunks to Pinecone (ns='{settings.PINECONE_NAMESPACE}')...")
+            ok = await llm_service.upsert_knowledge(to_upsert)
+            report = llm_service.last_upsert_report
+            upserted = report.get("upserted", 0)
+            failed = set(report.get("failed_ids", [])) if report else {d["id"] for d in to_upsert}
+            # chunk yang gagal tidak dicatat → file-nya diproses & di-upsert ulang pada run berikutnya
+            for entry in new_files.values():
+                ids = entry.get("chunk_ids", [])
+                if failed.intersection(ids):
+                    entry["chunk_ids"] = [i for i in ids if i not in failed]
+                    entry["sha256"] = None
+
+        pending_delete: List[str] = []
+        deleted = 0
+        to_delete = sorted(set(to_delete) - {i for f in new_files.values() for i in f.get("chunk_ids", [])})
+        if to_delete:
+            res = await llm_service.delete_vectors(to_delete)
+            deleted = res.get("deleted", 0)
+            if not res.get("ok"):
+                pending_delete = to_delete[deleted:]  # coba lagi di run berikutnya
+
+        manifest["files"] = new_files
+        manifest["pending_delete"] = pending_delete
+        try:
+            self._save_manifest(manifest)
+        except Exception as e:
+            logger.error(f"Gagal menyimpan manifest: {e}")
 
         idx_stats = await llm_service.get_index_stats()
         return {
-            "success": ok,
+            "success": ok and not pending_delete,
             "stats": {
                 "files_found": len(files),
                 "files_processed": processed,
-                "chunks_generated": len(all_docs),
-                "chunks_upserted": len(all_docs) if ok else 0,
+                "files_added": counts["added"],
+                "files_updated": counts["updated"],
+                "files_deleted": counts["deleted"],
+                "files_unchanged": counts["unchanged"],
+                "chunks_generated": all_docs_count,
+                "chunks_upserted": upserted,
+                "chunks_deleted": deleted,
+                "chunks_pending_delete": len(pending_delete),
+                "failed_batches": llm_service.last_upsert_report.get("failed_batches", 0) if to_upsert else 0,
+                "kb_version": manifest.get("version"),
                 "index_stats": idx_stats,
                 "finished_at": datetime.now().isoformat(),
             },
@@ -0,0 +1,168 @@
+# Snapshot in-process tabel jadwal (jadwal_kuliah, jadwal_uas, wali_kelas) + index hash
+"""
+Schedule Snapshot
+- Dibangun dari seluruh baris tabel (dimuat DatabaseService per halaman)
+- Index: kelas exact, basis kelas (3KA11 → 3KA11A/B/C), prefix (3KA) dan nama dosen
+  (exact + trigram untuk nama yang salah ketik / pakai gelar)
+- Statistik prefix (min/max/jumlah basis kelas) dihitung sekali per refresh dari
+  jadwal_kuliah + jadwal_uas → petunjuk "kelas tidak ditemukan" cukup satu lookup dict
+- Immutable: refresh membangun snapshot baru lalu ditukar sekaligus → pembaca tidak pernah
+  melihat index setengah jadi, dan snapshot lama tetap dipakai bila refresh gagal
+- Semantik lookup mengikuti query PostgREST lama (eq / ilike 'x%' / ilike '%x%')
+
+Catatan: baris (dict) dipakai bersama semua request → pemanggil tidak boleh memutasinya.
+"""
+
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.name_index import NameIndex
+
+RE_BASE = re.compile(r"^[1-6][A-Z]{2,3}\d{2}")
+RE_PREFIX = re.compile(r"^[1-6][A-Z]{2,3}")
+RE_PREFIX_NUM = re.compile(r"^([1-6][A-Z]{2,3})(\d{2})")
+
+def empty_prefix_stats() -> Dict[str, Any]:
+    # selalu objek baru: pemanggil boleh mengubah hasilnya (termasuk list "kelas")
+    return {"exists": False, "min": None, "max": None, "count": 0, "kelas": []}
+
+
+def _compact(row: Dict[str, Any]) -> Dict[str, Any]:
+    # nilai teks berulang (hari, ruang, dosen, ...) di-intern → satu objek string per nilai unik
+    return {sys.intern(k): (sys.intern(v) if isinstance(v, str) else v) for k, v in row.items()}
+
+
+def _group(keys: Iterable[Tuple[Optional[str], int]]) -> Dict[str, Tuple[int, ...]]:
+    out: Dict[str, List[int]] = {}
+    for key, i in keys:
+        if key:
+            out.setdefault(key, []).append(i)
+    return {k: tuple(v) for k, v in out.items()}
+
+
+def _match(regex: re.Pattern, kelas: str) -> Optional[str]:
+    m = regex.match(kelas)
+    return m.group(0) if m else None
+
+
+class _KelasTable:
+    """Baris satu tabel + index kelas (key selalu UPPER, apa pun case di DB)."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows: Tuple[Dict[str, Any], ...] = tuple(_compact(r) for r in rows)
+        codes = [(r.get("kelas") or "").strip().upper() for r in self.rows]
+        self.by_kelas = _group((c, i) for i, c in enumerate(codes))
+        self.by_base = _group((_match(RE_BASE, c), i) for i, c in enumerate(codes))
+        by_prefix: Dict[str, set] = {}
+        for c in self.by_kelas:
+            p = _match(RE_PREFIX, c)
+            if p:
+                by_prefix.setdefault(p, set()).add(c)
+        self.kelas_by_prefix: Dict[str, Tuple[str, ...]] = {p: tuple(sorted(v)) for p, v in by_prefix.items()}
+
+    def _take(self, idx: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.rows[i] for i in idx]
+
+    def exact(self, kelas: str) -> List[Dict[str, Any]]:
+        return self._take(self.by_kelas.get(kelas.upper(), ()))
+
+    def startswith(self, kelas: str) -> List[Dict[str, Any]]:
+        """Setara ilike 'kelas%'."""
+        k = kelas.upper()
+        if RE_BASE.fullmatch(k):
+            return self._take(self.by_base.get(k, ()))
+        return self._take(i for c, idx in self.by_kelas.items() if c.startswith(k) for i in idx)
+
+    def kelas_startswith(self, prefix: str) -> List[str]:
+        p = prefix.upper()
+        if RE_PREFIX.fullmatch(p):
+            return list(self.kelas_by_prefix.get(p, ()))
+        return [c for c in self.by_kelas if c.startswith(p)]
+
+
+class ScheduleSnapshot:
+    def __init__(
+        self,
+        jadwal_kuliah: List[Dict[str, Any]],
+        jadwal_uas: List[Dict[str, Any]],
+        wali_kelas: List[Dict[str, Any]],
+    ):
+        started = time.perf_counter()
+        self.kuliah = _KelasTable(jadwal_kuliah)
+        self.uas = _KelasTable(jadwal_uas)
+        self.wali = _KelasTable(wali_kelas)
+        self.by_dosen = _group(
+            ((r.get("dosen") or "").strip().upper(), i) for i, r in enumerate(self.kuliah.rows)
+        )
+        self.dosen_index = NameIndex(self.by_dosen)
+        self.prefix_index = self._build_prefix_index(
+            list(self.kuliah.by_kelas) + list(self.uas.by_kelas)
+        )
+        self.loaded_at = time.time()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    @staticmethod
+    def _build_prefix_index(codes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """prefix → {min, max, count, kelas}; kelas = basis 2 digit unik (3KA11A & 3KA11B → 3KA11)."""
+        nums: Dict[str, set] = {}
+        for code in codes:
+            m = RE_PREFIX_NUM.match(code)
+            if m:
+                nums.setdefault(m.group(1), set()).add(int(m.group(2)))
+        return {
+            p: {
+                "exists": True,
+                "min": min(ns),
+                "max": max(ns),
+                "count": len(ns),
+                "kelas": tuple(f"{p}{n:02d}" for n in sorted(ns)),
+            }
+            for p, ns in nums.items()
+        }
+
+    # ---------------- Lookup ----------------
+    def jadwal_kuliah_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
+        k = kelas.upper().strip()
+        if re.fullmatch(r"[1-6][A-Z]{2,3}\d{2}", k):
+            return self.kuliah.startswith(k)
+        return self.kuliah.exact(k)
+
+    def jadwal_uas_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
+        k = kelas.strip()
+        if re.search(r"[a-zA-Z]$", k):
+            return self.uas.exact(k)
+        return self.uas.startswith(k)
+
+    def wali_kelas_by_kelas(self, kelas: str) -> List[Dict[str, Any]]:
+        return self.wali.exact(kelas.strip())
+
+    def jadwal_kuliah_by_dosen(self, dosen: str, min_score: float = 0.6) -> List[Dict[str, Any]]:
+        """Nama kanonik dari index trigram (substring dulu, lalu fuzzy) → lookup exact per nama."""
+        names = self.dosen_index.resolve(dosen, min_score=min_score)
+        return [self.kuliah.rows[i] for name in names for i in self.by_dosen[name]]
+
+    def kelas_by_prefix(self, prefix: str, include_uas: bool = True) -> List[str]:
+        found = set(self.kuliah.kelas_startswith(prefix))
+        if include_uas:
+            found.update(self.uas.kelas_startswith(prefix))
+        return list(found)
+
+    def prefix_stats(self, prefix: str) -> Dict[str, Any]:
+        st = self.prefix_index.get(prefix.upper().strip())
+        if not st:
+            return empty_prefix_stats()
+        return {**st, "kelas": list(st["kelas"])}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded_at": self.loaded_at,
+            "build_ms": self.build_ms,
+            "jadwal_kuliah": len(self.kuliah.rows),
+            "jadwal_uas": len(self.uas.rows),
+            "wali_kelas": len(self.wali.rows),
+            "kelas": len(self.kuliah.by_kelas),
+            "dosen": len(self.by_dosen),
+            "prefixes": len(self.prefix_index),
+        }
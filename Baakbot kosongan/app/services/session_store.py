@@ -0,0 +1,519 @@
+# Penyimpanan sesi percakapan: in-memory (per proses) atau SQLite WAL (dibagi antar worker uvicorn)
+"""
+Session Store
+- SessionContext / ConversationExchange: record sesi ber-__slots__ (tanpa __dict__ per objek),
+  timestamp epoch float (time.time), exchanges = ExchangeRing (ring buffer kapasitas tetap
+  MAX_MEMORY_EXCHANGES; deque tidak dipakai karena blok internalnya ~760 bytes per objek)
+- encode_session / decode_session: serialisasi ringkas → JSON array tanpa nama field,
+  timestamp epoch float
+- InMemorySessionStore: OrderedDict per proses, urut aktivitas terakhir → sesi kedaluwarsa
+  selalu di depan (purge O(jumlah yang kedaluwarsa)) dan eviksi LRU O(1) saat melewati max_live
+  (batas keras, dicek tiap put)
+- SQLiteSessionStore: satu file SQLite mode WAL → beberapa proses uvicorn di host yang sama
+  melihat sesi yang sama (pending_intent yang diset worker A terbaca di worker B).
+  max_live di sini batas lunak: hanya ditegakkan sweeper (COUNT per put = scan tabel)
+- Latensi tiap operasi (get/put/delete/purge/count) + gauge sesi hidup, eviksi dan
+  memori dicatat → /api/metrics (memory: perkiraan batas atas, sqlite: ukuran file DB)
+- write_snapshot / read_snapshot: file snapshot biner (magic + [last_activity f64, panjang u32,
+  encode_session]...) untuk store memory → sesi bertahan saat redeploy / restart
+
+Catatan: objek dari InMemorySessionStore adalah objek yang sama dengan yang disimpan,
+sedangkan store lain mengembalikan salinan hasil decode → setelah memutasi sesi,
+MemoryManager selalu memanggil put().
+API store sinkron; store dengan blocking=True (sqlite, bisa menunggu lock sampai
+busy_timeout) dipanggil MemoryManager lewat pool thread, bukan langsung di event loop.
+"""
+
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+CODEC_VERSION = 1
+
+
+class ExchangeRing:
+    """
+    Ring buffer kapasitas tetap: append ke-(N+1) menimpa slot tertua, tanpa realokasi list.
+    Iterasi dari yang tertua ke yang terbaru (urutan sama dengan list lama).
+    """
+
+    __slots__ = ("_buf", "_head", "_size")
+
+    def __init__(self, capacity: int, items: Iterable[Any] = ()):
+        self._buf: List[Any] = [None] * max(1, capacity)
+        self._head = 0  # slot yang ditulis berikutnya
+        self._size = 0
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Any) -> None:
+        self._buf[self._head] = item
+        self._head = (self._head + 1) % len(self._buf)
+        if self._size < len(self._buf):
+            self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        cap = len(self._buf)
+        start = (self._head - self._size) % cap
+        for i in range(self._size):
+            yield self._buf[(start + i) % cap]
+
+
+def exchange_buffer(items: Iterable["ConversationExchange"] = ()) -> ExchangeRing:
+    return ExchangeRing(settings.MAX_MEMORY_EXCHANGES, items)
+
+
+@dataclass(slots=True)
+class ConversationExchange:
+    timestamp: float  # epoch (time.time)
+    user_message: str
+    bot_response: str
+    intent_type: Optional[str] = None
+    parameters: Optional[Dict] = None
+
+
+@dataclass(slots=True)
+class SessionContext:
+    session_id: str
+    created_at: float  # epoch (time.time)
+    last_activity: float
+    current_topic: Optional[str] = None
+    pending_intent: Optional[str] = None  # For clarification flow
+    pending_parameters: Optional[Dict] = None
+    exchanges: Optional[ExchangeRing] = None
+
+    def __post_init__(self):
+        if self.exchanges is None:
+            self.exchanges = exchange_buffer()
+
+
+def copy_session(s: SessionContext) -> SessionContext:
+    """
+    Salinan sesi yang aman dibaca thread lain sementara handler memutasi aslinya
+    (ring exchange + pending_parameters disalin; objek exchange tidak pernah diubah setelah dibuat).
+    """
+    return SessionContext(
+        session_id=s.session_id,
+        created_at=s.created_at,
+        last_activity=s.last_activity,
+        current_topic=s.current_topic,
+        pending_intent=s.pending_intent,
+        pending_parameters=dict(s.pending_parameters) if s.pending_parameters is not None else None,
+        exchanges=exchange_buffer(s.exchanges),
+    )
+
+
+# ---------------- Serialisasi ----------------
+def encode_session(s: SessionContext) -> bytes:
+    return json.dumps(
+        [
+            CODEC_VERSION,
+            s.session_id,
+            s.created_at,
+            s.last_activity,
+            s.current_topic,
+            s.pending_intent,
+            s.pending_parameters,
+            [
+                [e.timestamp, e.user_message, e.bot_response, e.intent_type, e.parameters]
+                for e in s.exchanges
+            ],
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,  # enum / nilai lain di parameters → string
+    ).encode("utf-8")
+
+
+def decode_session(data: bytes) -> SessionContext:
+    v = json.loads(data)
+    if not isinstance(v, list) or not v or v[0] != CODEC_VERSION:
+        raise ValueError("format sesi tidak dikenal")
+    _, sid, created, last, topic, pending_intent, pending_params, exchanges = v
+    return SessionContext(
+        session_id=sid,
+        created_at=created,
+        last_activity=last,
+        current_topic=topic,
+        pending_intent=pending_intent,
+        pending_parameters=pending_params,
+        exchanges=exchange_buffer(
+            ConversationExchange(ts, user, bot, intent, params)
+            for ts, user, bot, intent, params in exchanges
+        ),
+    )
+
+
+# ---------------- File snapshot ----------------
+SNAPSHOT_MAGIC = b"BAAKSES1"
+_RECORD_HEADER = struct.Struct(">dI")  # last_activity, panjang payload
+
+
+def write_snapshot(path: str, records: Iterable[Tuple[float, bytes]]) -> Tuple[int, int]:
+    """Tulis (last_activity, encode_session) ke file sementara lalu os.replace → (jumlah, bytes)."""
+    dst = Path(path)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")  # penulis bersamaan tidak bentrok
+    count = 0
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        for last_activity, payload in records:
+            f.write(_RECORD_HEADER.pack(last_activity, len(payload)))
+            f.write(payload)
+            count += 1
+    os.replace(tmp, dst)
+    return count, dst.stat().st_size
+
+
+def read_snapshot(path: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    (last_activity, payload) per record; last_activity ada di header supaya sesi kedaluwarsa
+    bisa dilewati tanpa decode. File terpotong → berhenti di record utuh terakhir.
+    """
+    data = Path(path).read_bytes()
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("bukan file snapshot sesi")
+    pos, end = len(SNAPSHOT_MAGIC), len(data)
+    while pos + _RECORD_HEADER.size <= end:
+        last_activity, size = _RECORD_HEADER.unpack_from(data, pos)
+        pos += _RECORD_HEADER.size
+        if pos + size > end:
+            return
+        yield last_activity, data[pos:pos + size]
+        pos += size
+
+
+def approx_session_bytes(s: SessionContext) -> int:
+    """
+    Perkiraan batas atas memori satu sesi (objek + string/dict/float di dalamnya).
+    Objek yang dibagi antar sesi (string/angka yang sama) ikut dihitung di tiap sesi,
+    jadi hasilnya bisa jauh di atas alokasi sebenarnya (lihat benchmarks/session_memory.py).
+    """
+    def _size(v: Any) -> int:
+        if isinstance(v, dict):
+            return sys.getsizeof(v) + sum(_size(k) + _size(x) for k, x in v.items())
+        if isinstance(v, (list, tuple)):
+            return sys.getsizeof(v) + sum(_size(x) for x in v)
+        if hasattr(type(v), "__slots__"):
+            return sys.getsizeof(v) + sum(_size(getattr(v, f)) for f in type(v).__slots__)
+        if hasattr(v, "__dict__"):
+            return sys.getsizeof(v) + _size(vars(v))
+        return sys.getsizeof(v)
+    return _size(s)
+
+
+# ---------------- Store ----------------
+class SessionStore:
+    """Antarmuka store; subclass mengimplementasikan _get/_put/_update/_delete/_purge/_count."""
+
+    backend = "base"
+    blocking = False  # True = operasi bisa menunggu I/O / lock → jangan dipanggil di event loop
+    max_live_on_put = False  # True = max_live ditegakkan tiap put (batas keras), False = oleh sweeper
+    memory_kind: Optional[str] = None  # arti gauge memory_bytes
+
+    def __init__(self, max_live: int = 0):
+        self.max_live = max(0, max_live)  # 0 = tanpa batas
+        self.writes = 0  # jumlah perubahan: put/delete/purge/eviksi (snapshot berkala dilewati bila tetap)
+        self.evictions = 0
+        self.expired = 0
+        self._ops_lock = threading.Lock()
+        self._ops: Dict[str, List[float]] = {}  # op → [jumlah, total detik, maks detik]
+
+    @contextmanager
+    def _timed(self, op: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._ops_lock:
+                st = self._ops.setdefault(op, [0, 0.0, 0.0])
+                st[0] += 1
+                st[1] += elapsed
+                st[2] = max(st[2], elapsed)
+
+    def get(self, session_id: str) -> Optional[SessionContext]:
+        with self._timed("get"):
+            return self._get(session_id)
+
+    def put(self, session: SessionContext) -> None:
+        with self._timed("put"):
+            self._put(session)
+        self.writes += 1
+
+    def update(self, session: SessionContext) -> bool:
+        """Seperti put, tapi hanya bila sesi masih ada (tidak dihapus/kedaluwarsa/dieviksi)."""
+        with self._timed("update"):
+            updated = self._update(session)
+        if updated:
+            self.writes += 1
+        return updated
+
+    def delete(self, session_id: str) -> bool:
+        with self._timed("delete"):
+            deleted = self._delete(session_id)
+        if deleted:
+            self.writes += 1
+        return deleted
+
+    def purge_expired(self, threshold: float) -> int:
+        """Hapus sesi dengan last_activity (epoch) < threshold; kembalikan jumlahnya."""
+        with self._timed("purge"):
+            n = self._purge(threshold)
+        self.expired += n
+        if n:
+            self.writes += 1
+        return n
+
+    def enforce_limit(self) -> int:
+        """Buang sesi paling lama tidak aktif di atas max_live; kembalikan jumlahnya."""
+        if not self.max_live:
+            return 0
+        with self._timed("evict"):
+            n = self._evict_overflow()
+        self.evictions += n
+        if n:
+            self.writes += 1
+        return n
+
+    def count(self) -> int:
+        with self._timed("count"):
+            return self._count()
+
+    def _get(self, session_id: str) -> Optional[SessionContext]:
+        raise NotImplementedError
+
+    def _put(self, session: SessionContext) -> None:
+        raise NotImplementedError
+
+    def _update(self, session: SessionContext) -> bool:
+        raise NotImplementedError
+
+    def _delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def _purge(self, threshold: float) -> int:
+        raise NotImplementedError
+
+    def _count(self) -> int:
+        raise NotImplementedError
+
+    def _evict_overflow(self) -> int:
+        raise NotImplementedError
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._ops_lock:
+            ops = {k: list(v) for k, v in self._ops.items()}
+        return {
+            "backend": self.backend,
+            "live_sessions": self.count(),
+            "max_live": self.max_live or None,
+            "max_live_hard": self.max_live_on_put,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "memory_bytes": self.memory_bytes(),
+            "memory_bytes_kind": self.memory_kind,
+            "ops": {
+                op: {
+                    "count": n,
+                    "avg_ms": round(total / n * 1000, 4) if n else None,
+                    "max_ms": round(peak * 1000, 4),
+                }
+                for op, (n, total, peak) in sorted(ops.items())
+            },
+        }
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Urutan OrderedDict = urutan put() (MemoryManager selalu put setelah last_activity
+    diperbarui) → depan = paling lama tidak aktif. get() tidak mengubah urutan.
+    """
+
+    backend = "memory"
+    max_live_on_put = True
+    memory_kind = "upper_bound_estimate"  # approx_session_bytes x jumlah sesi
+    MEMORY_SAMPLE = 64  # jumlah sesi terbaru yang diukur untuk perkiraan memori
+
+    def __init__(self, max_live: int = 0):
+        super().__init__(max_live)
+        self.sessions: "OrderedDict[str, SessionContext]" = OrderedDict()
+
+    def _get(self, session_id: str) -> Optional[SessionContext]:
+        return self.sessions.get(session_id)
+
+    def _put(self, session: SessionContext) -> None:
+        self.sessions[session.session_id] = session
+        self.sessions.move_to_end(session.session_id)
+        if self.max_live and len(self.sessions) > self.max_live:
+            self.sessions.popitem(last=False)  # LRU: sesi paling lama tidak aktif
+            self.evictions += 1
+
+    def _update(self, session: SessionContext) -> bool:
+        if session.session_id not in self.sessions:
+            return False
+        self._put(session)
+        return True
+
+    def _delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def _purge(self, threshold: float) -> int:
+        n = 0
+        while self.sessions:
+            sid, s = next(iter(self.sessions.items()))
+            if s.last_activity >= threshold:
+                break  # sisanya lebih baru
+            del self.sessions[sid]
+            n += 1
+        return n
+
+    def _count(self) -> int:
+        return len(self.sessions)
+
+    def snapshot(self) -> List[SessionContext]:
+        """
+        Salinan sesi (copy_session) dari yang paling lama tidak aktif ke yang terbaru;
+        panggil di event loop, hasilnya boleh di-encode di thread lain.
+        """
+        return [copy_session(s) for s in self.sessions.values()]
+
+    def _evict_overflow(self) -> int:
+        n = 0
+        while len(self.sessions) > self.max_live:
+            self.sessions.popitem(last=False)
+            n += 1
+        return n
+
+    def memory_bytes(self) -> Optional[int]:
+        if not self.sessions:
+            return 0
+        sample = []
+        for sid in reversed(self.sessions):
+            sample.append(approx_session_bytes(self.sessions[sid]))
+            if len(sample) >= self.MEMORY_SAMPLE:
+                break
+        return int(sum(sample) / len(sample) * len(self.sessions)) + sys.getsizeof(self.sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Satu baris per sesi: (session_id, last_activity epoch, data hasil encode_session).
+    WAL → pembaca tidak diblok penulis; synchronous=NORMAL cukup (kehilangan beberapa
+    transaksi terakhir saat listrik mati masih bisa diterima untuk data sesi).
+    max_live = batas lunak: put tidak menghitung baris (file dibagi antar worker, COUNT = scan
+    tabel), kelebihan dibuang sweeper tiap SESSION_SWEEP_INTERVAL_SECONDS.
+    """
+
+    backend = "sqlite"
+    blocking = True
+    memory_kind = "db_file_size"
+
+    def __init__(self, path: str, max_live: int = 0, busy_timeout: float = 5.0):
+        super().__init__(max_live)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []  # koneksi semua thread → ditutup di close()
+        self._conns_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, last_activity REAL NOT NULL, data BLOB NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions(last_activity)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit (isolation_level=None): tiap statement satu transaksi singkat;
+            # check_same_thread=False hanya supaya close() bisa menutup koneksi thread lain
+            conn = sqlite3.connect(
+                str(self.path), timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _get(self, session_id: str) -> Optional[SessionContext]:
+        row = self._conn().execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return decode_session(row[0]) if row else None
+
+    def _put(self, session: SessionContext) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, last_activity, data) VALUES (?, ?, ?)",
+            (session.session_id, session.last_activity, encode_session(session)),
+        )
+
+    def _update(self, session: SessionContext) -> bool:
+        return self._conn().execute(
+            "UPDATE sessions SET last_activity = ?, data = ? WHERE session_id = ?",
+            (session.last_activity, encode_session(session), session.session_id),
+        ).rowcount > 0
+
+    def _delete(self, session_id: str) -> bool:
+        return self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def _purge(self, threshold: float) -> int:
+        return self._conn().execute(
+            "DELETE FROM sessions WHERE last_activity < ?", (threshold,)
+        ).rowcount
+
+    def _count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _evict_overflow(self) -> int:
+        return self._conn().execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_activity DESC LIMIT -1 OFFSET ?)",
+            (self.max_live,),
+        ).rowcount
+
+    def memory_bytes(self) -> Optional[int]:
+        # ukuran file DB (sesi tidak tinggal di memori proses)
+        conn = self._conn()
+        return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def close(self) -> None:
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "path": str(self.path)}
+
+
+def create_session_store(backend: str, sqlite_path: str, max_live: int = 0) -> SessionStore:
+    backend = (backend or "memory").lower()
+    if backend == "memory":
+        return InMemorySessionStore(max_live)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, max_live)
+    raise ValueError(f"SESSION_STORE tidak dikenal: {backend!r} (pilih memory / sqlite)")
@@ -0,0 +1,247 @@
+# Backend SQLite lokal (dari data/csv_files) dengan API builder ala supabase/postgrest
+"""
+SQLite Backend
+- build_database(): muat CSV hasil scraper ke SQLite + index (kelas, dosen, start_date)
+  Nama tabel/kolom mengikuti tabel Supabase: loket.csv → jadwal_loket, kolom order → ord,
+  string kosong → NULL, tiap tabel punya kolom id
+- SQLiteClient: table().select().eq()/ilike()/in_()/order()/range()/limit().execute() → .data
+  cukup untuk semua query di DatabaseService, jadi method-nya tidak perlu tahu backend-nya
+- DB dibangun ulang otomatis bila ada CSV yang lebih baru dari file DB
+
+Catatan: kolom kelas memakai COLLATE NOCASE supaya ilike 'PREFIX%' bisa memakai index
+(konsekuensinya eq kelas juga case-insensitive, tidak masalah untuk data ini).
+"""
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# tabel → (file CSV, kolom INTEGER, kolom yang di-index)
+TABLES: Dict[str, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {
+    "jadwal_kuliah": ("jadwal_kuliah.csv", (), ("kelas", "dosen")),
+    "jadwal_uas": ("jadwal_uas.csv", (), ("kelas",)),
+    "wali_kelas": ("wali_kelas.csv", (), ("kelas", "prefix")),
+    "kalender_akademik": ("kalender_akademik.csv", ("ord", "level"), ("start_date",)),
+    "jadwal_loket": ("loket.csv", (), ()),
+}
+COLUMN_RENAMES = {"order": "ord"}
+NOCASE_COLUMNS = {"kelas", "prefix"}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _needs_rebuild(db_path: Path, csv_dir: Path) -> bool:
+    if not db_path.exists():
+        return True
+    built = db_path.stat().st_mtime
+    return any(
+        (csv_dir / f).exists() and (csv_dir / f).stat().st_mtime > built
+        for f, _, _ in TABLES.values()
+    )
+
+
+def build_database(csv_dir: str, db_path: str) -> Dict[str, int]:
+    """Bangun ulang file SQLite dari CSV (tulis ke file sementara lalu os.replace)."""
+    src, dst = Path(csv_dir), Path(db_path)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_suffix(".building")
+    if tmp.exists():
+        tmp.unlink()
+
+    counts: Dict[str, int] = {}
+    conn = sqlite3.connect(str(tmp))
+    try:
+        for table, (filename, int_cols, index_cols) in TABLES.items():
+            path = src / filename
+            if not path.exists():
+                logger.warning(f"SQLite backend: {path} tidak ada, tabel {table} kosong")
+                rows: List[Dict[str, str]] = []
+                header: List[str] = []
+            else:
+                with open(path, newline="", encoding="utf-8-sig") as f:
+                    reader = csv.DictReader(f)
+                    header = [COLUMN_RENAMES.get(h, h) for h in (reader.fieldnames or [])]
+                    rows = [
+                        {COLUMN_RENAMES.get(k, k): v for k, v in r.items()}
+                        for r in reader
+                    ]
+
+            defs = ["id INTEGER PRIMARY KEY"]
+            for col in header:
+                typ = "INTEGER" if col in int_cols else "TEXT"
+                coll = " COLLATE NOCASE" if col in NOCASE_COLUMNS else ""
+                defs.append(f"{_quote(col)} {typ}{coll}")
+            conn.execute(f"CREATE TABLE {_quote(table)} ({', '.join(defs)})")
+
+            def _value(col: str, raw: Optional[str]):
+                raw = (raw or "").strip()
+                if raw == "":
+                    return None
+                if col in int_cols:
+                    try:
+                        return int(raw)
+                    except ValueError:
+                        return raw
+                return raw
+
+            if header:
+                marks = ",".join("?" * len(header))
+                cols = ",".join(_quote(c) for c in header)
+                conn.executemany(
+                    f"INSERT INTO {_quote(table)} ({cols}) VALUES ({marks})",
+                    [tuple(_value(c, r.get(c)) for c in header) for r in rows],
+                )
+            for col in index_cols:
+                if col in header:
+                    conn.execute(
+                        f"CREATE INDEX {_quote(f'idx_{table}_{col}')} ON {_quote(table)}({_quote(col)})"
+                    )
+            counts[table] = len(rows)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, dst)
+    return counts
+
+
+class _Response:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+        self.count = None
+
+
+class _Query:
+    """Subset builder postgrest (sync) yang dipakai DatabaseService."""
+
+    def __init__(self, client: "SQLiteClient", table: str):
+        self._client = client
+        self._table = table
+        self._columns = "*"
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    def select(self, columns: str = "*", *args, **kwargs) -> "_Query":
+        cols = [c.strip() for c in (columns or "*").split(",") if c.strip()]
+        self._columns = "*" if (not cols or "*" in cols) else ", ".join(_quote(c) for c in cols)
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        self._where.append(f"{_quote(column)} = ?")
+        self._params.append(value)
+        return self
+
+    def ilike(self, column: str, pattern: str) -> "_Query":
+        # LIKE di SQLite sudah case-insensitive (ASCII); '*' = wildcard gaya PostgREST
+        self._where.append(f"{_quote(column)} LIKE ?")
+        self._params.append(pattern.replace("*", "%"))
+        return self
+
+    def in_(self, column: str, values: Sequence[Any]) -> "_Query":
+        values = list(values)
+        if not values:
+            self._where.append("0")
+            return self
+        self._where.append(f"{_quote(column)} IN ({','.join('?' * len(values))})")
+        self._params.extend(values)
+        return self
+
+    def order(self, column: str, desc: bool = False, nullsfirst: bool = False) -> "_Query":
+        # default PostgREST: NULL di akhir untuk asc, di awal untuk desc
+        nulls_first = nullsfirst or desc
+        col = _quote(column)
+        self._order.append(f"({col} IS NULL) {'DESC' if nulls_first else 'ASC'}")
+        self._order.append(f"{col} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int) -> "_Query":
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._offset = int(start)
+        self._limit = max(0, int(end) - int(start) + 1)
+        return self
+
+    def _sql(self) -> str:
+        sql = f"SELECT {self._columns} FROM {_quote(self._table)}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        # tanpa order eksplisit → urutan id (stabil untuk pagination .range)
+        sql += " ORDER BY " + ", ".join(self._order + ["id"])
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+            if self._offset:
+                sql += f" OFFSET {self._offset}"
+        return sql
+
+    def execute(self) -> _Response:
+        return _Response(self._client.query(self._sql(), self._params))
+
+
+class SQLiteClient:
+    """Pengganti supabase.Client untuk DatabaseService (hanya .table())."""
+
+    def __init__(self, db_path: str, csv_dir: str):
+        self.db_path = Path(db_path)
+        self.csv_dir = Path(csv_dir)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._generation = 0
+        self.queries = 0
+        self.total_seconds = 0.0
+        self.ensure_built()
+
+    def ensure_built(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """Bangun ulang DB bila CSV lebih baru (atau force); koneksi thread lama otomatis dibuka ulang."""
+        with self._lock:
+            if not force and not _needs_rebuild(self.db_path, self.csv_dir):
+                return None
+            started = time.perf_counter()
+            counts = build_database(str(self.csv_dir), str(self.db_path))
+            self._generation += 1
+            logger.info(f"SQLite backend built in {(time.perf_counter() - started) * 1000:.0f} ms: {counts}")
+            return counts
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            # read-only: penulisan hanya lewat build_database
+            conn = sqlite3.connect(f"file:{self.db_path.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def query(self, sql: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        rows = [dict(r) for r in self._conn().execute(sql, list(params))]
+        with self._stats_lock:
+            self.queries += 1
+            self.total_seconds += time.perf_counter() - started
+        return rows
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.db_path),
+            "queries": self.queries,
+            "avg_ms": round(self.total_seconds / self.queries * 1000, 3) if self.queries else None,
+        }
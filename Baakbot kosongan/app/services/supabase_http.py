@@ -0,0 +1,167 @@
+# Klien PostgREST Supabase di atas satu pool HTTP (httpx) yang dikonfigurasi eksplisit
+"""
+Supabase HTTP
+- PooledPostgrestClient: SyncPostgrestClient dengan session httpx milik sendiri
+  (batas koneksi, keep-alive expiry, HTTP/2 bila paket h2 ada, timeout connect/read)
+- Satu client dipakai bersama oleh semua thread pool DB → request bersamaan memakai ulang
+  koneksi TLS yang sudah hangat (HTTP/2: multipleks di satu koneksi)
+- Metrik: request, in-flight (+ puncak), koneksi TCP/TLS baru (trace httpcore) dan isi pool
+
+DatabaseService hanya butuh .table(), jadi client Supabase penuh (auth/storage/realtime)
+tidak dibuat lagi.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from postgrest.utils import SyncClient
+
+try:
+    import h2  # noqa: F401  (dipakai httpx untuk HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class PoolMonitor:
+    """Counter thread-safe yang diisi event hook httpx + trace httpcore."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+
+    def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def on_request(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def on_response(self, response: httpx.Response) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if response.status_code >= 500:
+                self.errors += 1
+
+    def on_failure(self) -> None:
+        # request gagal sebelum ada response (timeout/koneksi) → hook response tidak terpanggil
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += 1
+
+
+class _MonitoredTransport(httpx.HTTPTransport):
+    def __init__(self, monitor: PoolMonitor, **kwargs):
+        super().__init__(**kwargs)
+        self._monitor = monitor
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return super().handle_request(request)
+        except Exception:
+            self._monitor.on_failure()
+            raise
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def __init__(
+        self,
+        rest_url: str,
+        api_key: str,
+        *,
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        connect_timeout: float,
+        read_timeout: float,
+        http2: bool = True,
+        schema: str = "public",
+        verify: bool = True,
+    ):
+        # dibaca create_session() yang dipanggil dari __init__ base class
+        self.monitor = PoolMonitor()
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.transport: Optional[_MonitoredTransport] = None  # dibuat di create_session (butuh verify)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout)
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": api_key,
+            "Authorization": f"Bearer {api_key}",
+        }
+        super().__init__(rest_url, schema=schema, headers=headers, timeout=timeout, verify=verify)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Any,
+        verify: bool = True,
+    ) -> SyncClient:
+        # transport kustom → httpx membaca verify dari transport, bukan dari client
+        self.transport = _MonitoredTransport(self.monitor, http2=self.http2, limits=self.limits, verify=verify)
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=self.transport,
+            event_hooks={"request": [self.monitor.on_request], "response": [self.monitor.on_response]},
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        m = self.monitor
+        pool = getattr(self.transport, "_pool", None)  # httpcore.ConnectionPool
+        conns = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in conns if c.is_idle())
+        with m._lock:
+            requests, opened = m.requests, m.connections_opened
+            out = {
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive": self.limits.max_keepalive_connections,
+                "keepalive_expiry_seconds": self.limits.keepalive_expiry,
+                "requests": requests,
+                "in_flight": m.in_flight,
+                "peak_in_flight": m.peak_in_flight,
+                "errors": m.errors,
+                "connections_opened": opened,
+                "tls_handshakes": m.tls_handshakes,
+            }
+        out.update({
+            "connection_reuse_rate": round(1 - opened / requests, 4) if requests else None,
+            "pool_connections": len(conns),
+            "pool_active": len(conns) - idle,
+            "pool_idle": idle,
+            "pool_utilization": round((len(conns) - idle) / self.limits.max_connections, 4)
+            if self.limits.max_connections else None,
+        })
+        return out
+
+
+def create_postgrest_client(supabase_url: str, supabase_key: str, **pool_options) -> PooledPostgrestClient:
+    """Client PostgREST untuk project Supabase (endpoint {url}/rest/v1)."""
+    return PooledPostgrestClient(f"{supabase_url.rstrip('/')}/rest/v1", supabase_key, **pool_options)
@@ -0,0 +1,432 @@
+# Backend vector store untuk RAG: Pinecone (remote) atau lokal (NumPy, in-process)
+"""
+Vector Store
+- Kontrak sama untuk semua backend: query / upsert / delete / delete_all / describe_stats
+- Filter metadata gaya Pinecone ({"doc_key": {"$in": [...]}}) diterapkan di sisi store,
+  bukan di-filter ulang setelah top-k
+- PineconeVectorStore: SDK sinkron dijalankan di MeteredExecutor khusus
+- LocalVectorStore   : matriks float32 ter-normalisasi (memory-mapped) + sidecar metadata JSON,
+                       top-k brute force via dot product → cocok untuk KB kecil (ratusan chunk),
+                       tanpa network hop, bisa jalan offline (tes & benchmark)
+Pilih lewat settings.VECTOR_STORE_BACKEND = "pinecone" | "local".
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.utils.executor import MeteredExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """Kontrak minimal yang dipakai LLMService."""
+
+    mode: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return False
+
+    async def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        namespace: str,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Kembalikan [{'id', 'score', 'metadata'}, ...] terurut score desc (hanya yang lolos filter)."""
+        raise NotImplementedError
+
+    async def upsert(self, vectors: List[Dict[str, Any]], namespace: str, timeout: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, ids: List[str], namespace: str) -> None:
+        raise NotImplementedError
+
+    async def delete_all(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    async def describe_stats(self) -> Any:
+        """Format seperti describe_index_stats Pinecone (dict atau objek SDK)."""
+        raise NotImplementedError
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"mode": self.mode}
+
+    def close(self) -> None:
+        pass
+
+
+# ======================= Pinecone =======================
+class PineconeVectorStore(VectorStore):
+    def __init__(self):
+        from pinecone import Pinecone  # impor di sini supaya backend lokal tidak butuh SDK/API key
+
+        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        # SDK Pinecone sinkron → semua panggilan index dijalankan di pool sendiri
+        self.pool = MeteredExecutor(
+            "pinecone",
+            max_workers=settings.PINECONE_MAX_WORKERS,
+            timeout=settings.PINECONE_TIMEOUT_SECONDS,
+        )
+        self.index = None
+        self.mode = None  # "v5-host" | "v5-name" | None
+
+        index_name: Optional[str] = getattr(settings, "PINECONE_INDEX_NAME", None)
+        # PENTING: host TANPA "https://"
+        index_host: Optional[str] = getattr(settings, "PINECONE_INDEX_HOST", None)
+
+        try:
+            if index_host:
+                host = index_host.replace("https://", "").strip()
+                self.index = self.pc.Index(host=host)
+                self.mode = "v5-host"
+                logger.info(f"Connected to Pinecone by HOST: {host}")
+            elif index_name:
+                # Coba resolve host dari controller → lalu konek by host
+                try:
+                    details = self.pc.describe_index(index_name)
+                    host = getattr(details, "host", None)
+                    if host is None and isinstance(details, dict):
+                        host = details.get("host")
+                    if host:
+                        self.index = self.pc.Index(host=host)
+                        self.mode = "v5-host"
+                        logger.info(f"Connected to Pinecone by RESOLVED HOST: {host}")
+                    else:
+                        # Fallback: biarkan SDK resolve by name
+                        self.index = self.pc.Index(index_name)
+                        self.mode = "v5-name"
+                        logger.info(f"Connected to Pinecone by NAME: {index_name}")
+                except Exception as e:
+                    # Fallback langsung by name
+                    self.index = self.pc.Index(index_name)
+                    self.mode = "v5-name"
+                    logger.warning(f"Host resolve failed, using name='{index_name}': {e}")
+            else:
+                logger.error("Pinecone index is not configured (no INDEX_HOST or INDEX_NAME).")
+        except Exception as e:
+            logger.error(f"Failed to connect to Pinecone index: {e}")
+            self.index = None
+
+    @property
+    def available(self) -> bool:
+        return self.index is not None
+
+    async def _call(self, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """Jalankan panggilan index Pinecone (sinkron) di pool khusus, dengan timeout."""
+        return await self.pool.run(fn, *args, timeout=timeout, **kwargs)
+
+    async def query(self, vector, top_k, namespace, filter=None):
+        kwargs = {"filter": filter} if filter else {}
+        res = await self._call(
+            self.index.query,
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace,
+            include_metadata=True,
+            **kwargs,
+        )
+        matches = res.get("matches", []) if isinstance(res, dict) else getattr(res, "matches", []) or []
+        out = []
+        for m in matches:
+            get = m.get if isinstance(m, dict) else (lambda k, _m=m: getattr(_m, k, None))
+            out.append({"id": get("id"), "score": get("score"), "metadata": get("metadata")})
+        return out
+
+    async def upsert(self, vectors, namespace, timeout=None):
+        await self._call(self.index.upsert, vectors=vectors, namespace=namespace, timeout=timeout)
+
+    async def delete(self, ids, namespace):
+        await self._call(self.index.delete, ids=ids, namespace=namespace)
+
+    async def delete_all(self, namespace):
+        await self._call(self.index.delete, delete_all=True, namespace=namespace)
+
+    async def describe_stats(self):
+        return await self._call(self.index.describe_index_stats)
+
+    def metrics(self):
+        return {"mode": self.mode, "executor": self.pool.stats()}
+
+    def close(self):
+        self.pool.shutdown()
+
+
+# ======================= Lokal (NumPy) =======================
+def match_filter(meta: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluasi subset filter metadata Pinecone: $eq $ne $in $nin $gt $gte $lt $lte $exists $and $or."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(match_filter(meta, c) for c in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_filter(meta, c) for c in cond):
+                return False
+            continue
+        value = meta.get(key)
+        ops = cond if isinstance(cond, dict) else {"$eq": cond}
+        for op, arg in ops.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$exists" and (key in meta) != bool(arg):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if not isinstance(value, (int, float)):
+                    return False
+                if (op == "$gt" and not value > arg) or (op == "$gte" and not value >= arg) \
+                        or (op == "$lt" and not value < arg) or (op == "$lte" and not value <= arg):
+                    return False
+    return True
+
+
+class _LocalNamespace:
+    """
+    Satu namespace: matriks (n, dim) float32 ter-normalisasi + ids + metadata.
+    State disimpan sebagai satu tuple (ids, metas, matrix) dan diganti sekaligus saat
+    penulisan, sehingga query di event loop selalu membaca snapshot yang konsisten.
+    Tiap penulisan memakai file vektor baru (vectors.<gen>.f32, namanya dicatat di meta.json):
+    file yang sedang di-memmap tidak pernah ditimpa (Windows menolak replace file yang di-map).
+    """
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self._state = ([], [], None)  # (ids, metas, matrix | np.memmap | None)
+        self._gen = 0
+        self._vec_name: Optional[str] = None
+        self._load()
+
+    @property
+    def size(self) -> int:
+        return len(self._state[0])
+
+    @property
+    def dim(self) -> Optional[int]:
+        matrix = self._state[2]
+        return None if matrix is None else int(matrix.shape[1])
+
+    def _load(self) -> None:
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            return
+        sidecar = json.loads(meta_path.read_text(encoding="utf-8"))
+        vec_name = sidecar.get("vectors", "vectors.f32")  # "vectors.f32" = format sebelum versi file
+        vec_path = self.dir / vec_name
+        if not vec_path.exists():
+            return
+        ids, dim = sidecar["ids"], int(sidecar["dim"])
+        matrix = None
+        if ids and dim:
+            matrix = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(len(ids), dim))
+        self._gen = int(sidecar.get("gen", 0))
+        self._vec_name = vec_name
+        self._state = (ids, sidecar["metadata"], matrix)
+        self._remove_stale_vectors()
+
+    def _remove_stale_vectors(self) -> None:
+        # file vektor generasi lama; yang masih di-map (query berjalan, Windows) dicoba lagi lain kali
+        for path in self.dir.glob("vectors*.f32"):
+            if path.name != self._vec_name:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _save(self, ids: List[str], metas: List[Dict[str, Any]], matrix: np.ndarray) -> None:
+        """Tulis file vektor generasi baru + meta.json (tmp + rename) lalu pasang memmap read-only-nya."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        gen = self._gen + 1
+        vec_name = f"vectors.{gen}.f32"
+        meta_path, meta_tmp = self.dir / "meta.json", self.dir / "meta.json.tmp"
+        dim = int(matrix.shape[1]) if matrix.ndim == 2 else 0
+        # nama baru belum dirujuk meta.json → aman ditulis langsung; meta.json diganti atomik
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(self.dir / vec_name)
+        meta_tmp.write_text(
+            json.dumps({"dim": dim, "gen": gen, "vectors": vec_name, "ids": ids, "metadata": metas},
+                       ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(meta_tmp, meta_path)
+        vec_path = self.dir / vec_name
+        mapped = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(len(ids), dim)) if ids and dim else None
+        self._gen, self._vec_name = gen, vec_name
+        self._state = (ids, metas, mapped)  # memmap lama dilepas begitu tidak direferensikan query lagi
+        self._remove_stale_vectors()
+
+    @staticmethod
+    def _normalize(rows: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return rows / norms
+
+    def upsert(self, vectors: List[Dict[str, Any]]) -> None:
+        new = self._normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+        old_ids, old_metas, old_matrix = self._state
+        if old_matrix is not None and old_matrix.shape[1] != new.shape[1]:
+            raise ValueError(f"Dimension mismatch: store={old_matrix.shape[1]}, vectors={new.shape[1]}")
+
+        ids, metas = list(old_ids), list(old_metas)
+        matrix = np.array(old_matrix, dtype=np.float32) if old_matrix is not None \
+            else np.empty((0, new.shape[1]), np.float32)
+        pos = {i: n for n, i in enumerate(ids)}
+        appended = []
+        for row, v in zip(new, vectors):
+            n = pos.get(v["id"])
+            if n is None:
+                pos[v["id"]] = len(ids)
+                ids.append(v["id"])
+                metas.append(v.get("metadata") or {})
+                appended.append(row)
+            else:
+                matrix[n] = row
+                metas[n] = v.get("metadata") or {}
+        if appended:
+            matrix = np.vstack([matrix, np.asarray(appended, dtype=np.float32)])
+        self._save(ids, metas, matrix)
+
+    def delete(self, ids: Optional[List[str]] = None) -> None:
+        old_ids, old_metas, old_matrix = self._state
+        if ids is None:
+            keep: List[int] = []
+        else:
+            drop = set(ids)
+            keep = [n for n, i in enumerate(old_ids) if i not in drop]
+            if len(keep) == len(old_ids):
+                return
+        dim = 0 if old_matrix is None else old_matrix.shape[1]
+        matrix = np.array(old_matrix[keep], dtype=np.float32) if (old_matrix is not None and keep) \
+            else np.empty((0, dim), np.float32)
+        self._save([old_ids[n] for n in keep], [old_metas[n] for n in keep], matrix)
+
+    def query(self, vector: List[float], top_k: int, flt: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        ids, metas, matrix = self._state
+        if matrix is None or not ids or top_k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0 or q.shape[0] != matrix.shape[1]:
+            return []
+        if flt:
+            # filter dulu, baru hitung skor hanya untuk baris yang lolos
+            rows = np.fromiter((n for n, m in enumerate(metas) if match_filter(m, flt)), dtype=np.intp)
+            if rows.size == 0:
+                return []
+            scores = matrix[rows] @ (q / norm)
+        else:
+            rows = None
+            scores = matrix @ (q / norm)  # cosine similarity (baris sudah ter-normalisasi)
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        out = []
+        for t in top:
+            n = int(rows[t]) if rows is not None else int(t)
+            out.append({"id": ids[n], "score": float(scores[t]), "metadata": metas[n]})
+        return out
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.mode = "local"
+        self._namespaces: Dict[str, _LocalNamespace] = {}
+        self._lock = threading.Lock()  # serialisasi penulisan; query membaca snapshot memmap
+        self._queries = 0
+        self._query_seconds = 0.0
+        self.path.mkdir(parents=True, exist_ok=True)
+        for d in self.path.iterdir():
+            if d.is_dir():
+                self._namespaces[self._ns_name(d.name)] = _LocalNamespace(d)
+        logger.info(f"Local vector store at {self.path} ({sum(n.size for n in self._namespaces.values())} vectors)")
+
+    @staticmethod
+    def _ns_dir(namespace: str) -> str:
+        return namespace or "__default__"
+
+    @staticmethod
+    def _ns_name(dirname: str) -> str:
+        return "" if dirname == "__default__" else dirname
+
+    def _ns(self, namespace: str) -> _LocalNamespace:
+        # dipanggil di thread penulis (di bawah _lock); dict diganti utuh (copy-on-write)
+        # supaya describe_stats/metrics di event loop tidak melihat dict berubah saat iterasi
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = _LocalNamespace(self.path / self._ns_dir(namespace))
+            self._namespaces = {**self._namespaces, namespace: ns}
+        return ns
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    async def query(self, vector, top_k, namespace, filter=None):
+        # in-process & sub-milidetik untuk ratusan chunk → tidak perlu thread
+        started = time.perf_counter()
+        ns = self._namespaces.get(namespace)
+        out = ns.query(vector, top_k, filter) if ns else []
+        self._queries += 1
+        self._query_seconds += time.perf_counter() - started
+        return out
+
+    async def _write(self, fn, *args):
+        def _locked():
+            with self._lock:
+                fn(*args)
+        await asyncio.to_thread(_locked)
+
+    async def upsert(self, vectors, namespace, timeout=None):
+        await self._write(lambda: self._ns(namespace).upsert(vectors))
+
+    async def delete(self, ids, namespace):
+        await self._write(lambda: self._ns(namespace).delete(ids))
+
+    async def delete_all(self, namespace):
+        await self._write(lambda: self._ns(namespace).delete(None))
+
+    async def describe_stats(self):
+        current = self._namespaces
+        namespaces = {name: {"vector_count": ns.size} for name, ns in current.items() if ns.size}
+        dims = [ns.dim for ns in current.values() if ns.dim]
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(v["vector_count"] for v in namespaces.values()),
+            "dimension": dims[0] if dims else None,
+        }
+
+    def metrics(self):
+        return {
+            "mode": self.mode,
+            "path": str(self.path),
+            "vectors": {name or "(default)": ns.size for name, ns in self._namespaces.items()},
+            "queries": self._queries,
+            "avg_query_ms": round(self._query_seconds / self._queries * 1000, 4) if self._queries else None,
+        }
+
+
+def create_vector_store() -> VectorStore:
+    backend = (settings.VECTOR_STORE_BACKEND or "pinecone").lower()
+    if backend == "local":
+        return LocalVectorStore(settings.LOCAL_VECTOR_STORE_PATH)
+    if backend != "pinecone":
+        logger.warning(f"Unknown VECTOR_STORE_BACKEND={backend!r}, using pinecone")
+    return PineconeVectorStore()
@@ -0,0 +1,104 @@
+# Thread pool terbatas + metrik antrean untuk panggilan I/O sinkron (SDK tanpa dukungan async)
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class MeteredExecutor:
+    """
+    ThreadPoolExecutor khusus satu jenis backend (mis. Pinecone, DB), terpisah
+    dari pool default asyncio.to_thread, supaya backend yang lambat tidak
+    menghabiskan thread milik backend lain.
+
+    Mencatat kedalaman antrean (menunggu thread), jumlah yang sedang jalan,
+    timeout, error, dan latensi rata-rata.
+    """
+
+    def __init__(self, name: str, max_workers: int, timeout: Optional[float] = None):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._finished = 0
+        self._total_seconds = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Jalankan fn(*args, **kwargs) di pool ini; raise asyncio.TimeoutError bila melewati timeout."""
+        loop = asyncio.get_running_loop()
+        state = {"started": False, "abandoned": False}
+        with self._lock:
+            self._queued += 1
+            self._submitted += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        def _call():
+            with self._lock:
+                if state["abandoned"]:
+                    return None  # pemanggil sudah menyerah selagi antre → jangan kerjakan
+                state["started"] = True
+                self._queued -= 1
+                self._running += 1
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._finished += 1
+                    self._total_seconds += time.perf_counter() - started
+
+        def _abandon():
+            with self._lock:
+                if not state["started"] and not state["abandoned"]:
+                    state["abandoned"] = True
+                    self._queued -= 1
+
+        fut = loop.run_in_executor(self._pool, _call)
+        limit = self.timeout if timeout is None else timeout
+        try:
+            result = await asyncio.wait_for(fut, limit) if limit else await fut
+        except asyncio.TimeoutError:
+            # catatan: thread yang sudah jalan tetap selesai di belakang; yang dibatalkan hanya penantian kita
+            _abandon()
+            with self._lock:
+                self._timeouts += 1
+            raise asyncio.TimeoutError(f"{self.name} call timed out after {limit}s") from None
+        except asyncio.CancelledError:
+            _abandon()
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        with self._lock:
+            self._completed += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._finished
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "max_queued": self._max_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "avg_ms": round(self._total_seconds / done * 1000, 2) if done else None,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
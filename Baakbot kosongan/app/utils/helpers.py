@@ -1,8 +1,26 @@
 # Fungsi-fungsi bantuan yang bisa digunakan di seluruh aplikasi
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 import re
 
+# Kolom yang dibaca formatter tiap intent (key = nilai IntentType).
+# DatabaseService hanya men-select kolom ini → tambah di sini bila format_* butuh kolom baru.
+FORMATTER_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    # format_jadwal_kuliah(_html) / format_jadwal_dosen_html
+    "jadwal_kuliah": ("kelas", "hari", "mata_kuliah", "waktu", "ruang", "dosen"),
+    "jadwal_dosen": ("kelas", "hari", "mata_kuliah", "waktu", "ruang", "dosen"),
+    # format_jadwal_uas(_html)
+    "jadwal_uas": ("kelas", "hari", "tanggal", "mata_kuliah", "waktu"),
+    # format_wali_kelas
+    "wali_kelas": ("kelas", "dosen"),
+    # format_jadwal_loket(_html)
+    "jadwal_loket": ("section", "hari", "jenis", "waktu_raw"),
+    # format_kalender_akademik(_html)
+    "kalender_akademik": (
+        "title", "ord", "level", "kegiatan", "parent_kegiatan", "tanggal_raw", "start_date", "end_date",
+    ),
+}
+
 class ResponseFormatter:
     # ==== Tambahan: peta bulan & parser ====
     _ID_MONTHS = {
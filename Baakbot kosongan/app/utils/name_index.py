@@ -0,0 +1,82 @@
+# Index trigram (inverted) untuk pencarian nama orang yang toleran typo & gelar (nama dosen)
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Gelar / sapaan yang sering ikut diketik user tapi tidak ada di data jadwal
+TITLE_TOKENS = {
+    "PAK", "BAPAK", "BU", "IBU", "DR", "DRS", "DRA", "IR", "PROF", "H", "HJ",
+    "SKOM", "MKOM", "MMSI", "MSC", "MT", "ST", "SE", "MM", "SSI", "MSI", "PHD",
+}
+
+
+def normalize_name(text: str) -> str:
+    """Upper, buang gelar di belakang koma ("X, S.Kom."), tanda baca, dan token gelar."""
+    # karakter lain jadi pemisah kata: "A/B", "NAMA(LURING)", "X-Y" → token terpisah
+    s = re.sub(r"[^A-Z.\s]", " ", (text or "").upper().split(",")[0])
+    tokens = (t.replace(".", "") for t in s.split())  # "S.Kom" → SKOM, "Dr." → DR
+    return " ".join(t for t in tokens if t and t not in TITLE_TOKENS)
+
+
+def trigrams(name: str) -> Set[str]:
+    # gaya pg_trgm: tiap kata di-pad "  KATA " → awal kata punya bobot lebih
+    out: Set[str] = set()
+    for tok in name.split():
+        padded = f"  {tok} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+class NameIndex:
+    def __init__(self, names: Iterable[str]):
+        self.names: Tuple[str, ...] = tuple(sorted({n for n in names if n}))
+        self._norm: Tuple[str, ...] = tuple(normalize_name(n) for n in self.names)
+        self._grams: List[Set[str]] = [trigrams(n) for n in self._norm]
+        self._postings: Dict[str, List[int]] = {}
+        for i, grams in enumerate(self._grams):
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def substring(self, query: str) -> List[str]:
+        """Nama yang memuat query utuh (semantik lama ilike '%query%', setelah buang gelar)."""
+        q = normalize_name(query)
+        if not q:
+            return []
+        return [name for name, norm in zip(self.names, self._norm) if q in norm]
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.5) -> List[Tuple[str, float, float]]:
+        """
+        Kandidat [(nama_kanonik, containment, jaccard)] terurut.
+        containment = porsi trigram query yang ada di nama (query boleh sebagian nama),
+        jaccard memecah seri (nama yang lebih pendek/lebih pas menang).
+        """
+        q = trigrams(normalize_name(query))
+        if not q:
+            return []
+        shared: Dict[int, int] = {}
+        for g in q:
+            for i in self._postings.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        ranked = []
+        for i, n in shared.items():
+            containment = n / len(q)
+            if containment < min_score:
+                continue
+            jaccard = n / (len(q) + len(self._grams[i]) - n)
+            ranked.append((self.names[i], round(containment, 4), round(jaccard, 4)))
+        ranked.sort(key=lambda r: (-r[1], -r[2], r[0]))
+        return ranked[:limit]
+
+    def resolve(self, query: str, min_score: float = 0.5) -> List[str]:
+        """
+        Nama kanonik untuk query: semua nama yang memuat query (bila ada),
+        selain itu satu kandidat fuzzy terbaik (typo, ejaan lain).
+        """
+        exact = self.substring(query)
+        if exact:
+            return exact
+        best = self.search(query, limit=1, min_score=min_score)
+        return [best[0][0]] if best else []
@@ -0,0 +1,69 @@
+# Cache hasil negatif ("tidak ditemukan") yang terbatas (LRU) dengan TTL pendek
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class NegativeCache:
+    """
+    key → info tambahan (mis. saran rentang kelas) untuk data yang pasti tidak ada.
+    - Entri kedaluwarsa setelah ttl detik; lebih dari max_entries → entri terlama dibuang
+    - clear() dipanggil saat data sumber di-refresh; put() dengan generation lama
+      (query mulai sebelum clear) diabaikan supaya hasil basi tidak masuk lagi
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, ttl: float = 300.0):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.clears = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, info: Dict[str, Any], generation: Optional[int] = None) -> bool:
+        if generation is not None and generation != self.generation:
+            return False
+        self._entries[key] = (info, time.monotonic())
+        self._entries.move_to_end(key)
+        self.stores += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self) -> int:
+        n = len(self._entries)
+        self._entries.clear()
+        self.generation += 1
+        self.clears += 1
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "clears": self.clears,
+        }
@@ -0,0 +1,55 @@
+# Penggabungan (coalescing) panggilan async identik yang sedang berjalan bersamaan
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Selama panggilan dengan key yang sama masih berjalan, pemanggil berikutnya
+    tidak memulai pekerjaan baru tetapi menunggu hasil panggilan pertama.
+    Setelah selesai key dilepas → panggilan berikutnya mulai baru (bukan cache).
+
+    Pekerjaan dijalankan sebagai task terpisah: bila pemanggil pertama dibatalkan
+    (mis. client putus), pemanggil lain yang ikut menunggu tetap mendapat hasil.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._leaders = 0
+        self._deduplicated = 0
+        self._max_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        else:
+            self._deduplicated += 1
+            self._waiters[key] = self._waiters.get(key, 1) + 1
+            self._max_waiters = max(self._max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # tandai sudah dibaca (hindari warning bila semua pemanggil batal)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "inflight": len(self._inflight),
+            "calls": self._calls,
+            "executed": self._leaders,
+            "deduplicated": self._deduplicated,
+            "max_waiters": self._max_waiters,
+        }
@@ -0,0 +1,102 @@
+# Cache read-through (async) dengan TTL + stale-while-revalidate untuk tabel yang jarang berubah
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    - Entri segar (umur < ttl)       → langsung dari memori
+    - Entri kedaluwarsa (stale)      → tetap dikembalikan, refresh jalan di background
+    - Belum ada entri                → loader ditunggu (pemanggil bersamaan berbagi satu loader)
+    Loader yang gagal tidak menimpa entri lama. Key berupa tuple; elemen pertama = nama tabel
+    (dipakai invalidate per tabel).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entries: Dict[Tuple, Tuple[Any, float, float]] = {}  # key → (value, fetched_at, ttl)
+        self._loading: Dict[Tuple, asyncio.Task] = {}
+        # naik tiap invalidate → hasil loader yang mulai sebelumnya dibuang
+        # (global untuk invalidate semua, per tabel supaya tabel lain tidak ikut terbuang)
+        self._generation = 0
+        self._table_generations: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _load(self, key: Tuple, loader: Callable[[], Awaitable[Any]], ttl: float) -> asyncio.Task:
+        task = self._loading.get(key)
+        if task is not None:
+            return task
+
+        async def _run():
+            generation = self._generation_of(key)
+            try:
+                value = await loader()
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.warning(f"[{self.name}] load {key} failed: {e}")
+                raise
+            if generation == self._generation_of(key):
+                self._entries[key] = (value, time.monotonic(), ttl)
+            self.refreshes += 1
+            return value
+
+        task = asyncio.ensure_future(_run())
+        self._loading[key] = task
+
+        def _done(t: asyncio.Task, k=key):
+            if self._loading.get(k) is t:
+                del self._loading[k]
+            if not t.cancelled():
+                t.exception()  # refresh background yang gagal tidak perlu dibaca siapa pun
+
+        task.add_done_callback(_done)
+        return task
+
+    def _generation_of(self, key: Tuple) -> Tuple[int, int]:
+        return self._generation, self._table_generations.get(key[0], 0)
+
+    async def get(self, key: Tuple, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at, entry_ttl = entry
+            if time.monotonic() - fetched_at < entry_ttl:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._load(key, loader, ttl)
+            return value
+        self.misses += 1
+        return await asyncio.shield(self._load(key, loader, ttl))
+
+    def invalidate(self, table: Optional[Hashable] = None) -> int:
+        """Buang entri (semua, atau milik satu tabel); request berikutnya memuat ulang."""
+        if table is None:
+            self._generation += 1
+        else:
+            self._table_generations[table] = self._table_generations.get(table, 0) + 1
+        keys = [k for k in self._entries if table is None or k[0] == table]
+        for k in keys:
+            del self._entries[k]
+        for k in [k for k in self._loading if table is None or k[0] == table]:
+            del self._loading[k]  # loader lama tetap jalan, tapi request baru tidak menunggunya
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 4) if total else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
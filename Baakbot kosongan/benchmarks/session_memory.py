@@ -0,0 +1,124 @@
+# Benchmark memori per sesi: record lama (dataclass + datetime + list) vs record sekarang
+"""
+Jalankan dari root project (butuh .env seperti aplikasi):
+
+    python benchmarks/session_memory.py --sessions 20000 --exchanges 3
+
+Mengukur alokasi (tracemalloc) untuk N sesi yang masing-masing berisi `exchanges`
+percakapan + pending clarification, lalu mencetak bytes per sesi.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.session_store import (  # noqa: E402
+    ConversationExchange,
+    SessionContext,
+    approx_session_bytes,
+    encode_session,
+    exchange_buffer,
+)
+
+
+# ---- record lama (sebelum __slots__ / float timestamp / ring buffer) ----
+@dataclass
+class LegacyExchange:
+    timestamp: datetime
+    user_message: str
+    bot_response: str
+    intent_type: Optional[str] = None
+    parameters: Optional[Dict] = None
+
+
+@dataclass
+class LegacySession:
+    session_id: str
+    created_at: datetime
+    last_activity: datetime
+    current_topic: Optional[str] = None
+    pending_intent: Optional[str] = None
+    pending_parameters: Optional[Dict] = None
+    exchanges: List[LegacyExchange] = None
+
+
+USER = "jadwal kuliah 3KA11 hari senin"
+BOT = "<b>Jadwal Kuliah 3KA11</b> ... " * 8
+
+
+def build_legacy(n: int, k: int) -> list:
+    out = []
+    for i in range(n):
+        now = datetime.now()
+        s = LegacySession(str(uuid.uuid4()), now, now, pending_intent="jadwal_ambiguous",
+                          pending_parameters={"kelas": "3KA11"}, exchanges=[])
+        for _ in range(k + 1):  # versi lama: append lalu slice → list baru
+            s.exchanges.append(LegacyExchange(datetime.now(), USER, BOT, "jadwal_kuliah", dict({"kelas": "3KA11"})))
+            if len(s.exchanges) > k:
+                s.exchanges = s.exchanges[-k:]
+        out.append(s)
+    return out
+
+
+def build_current(n: int, k: int) -> list:
+    out = []
+    for i in range(n):
+        now = time.time()
+        s = SessionContext(str(uuid.uuid4()), now, now, pending_intent="jadwal_ambiguous",
+                           pending_parameters={"kelas": "3KA11"}, exchanges=exchange_buffer())
+        for _ in range(k + 1):
+            s.exchanges.append(ConversationExchange(time.time(), USER, BOT, "jadwal_kuliah", {"kelas": "3KA11"}))
+        out.append(s)
+    return out
+
+
+def measure(builder, n: int, k: int):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    sessions = builder(n, k)
+    elapsed = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return sessions, used, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=20000)
+    ap.add_argument("--exchanges", type=int, default=3, help="= MAX_MEMORY_EXCHANGES")
+    args = ap.parse_args()
+    n, k = args.sessions, args.exchanges
+
+    # string pesan dibagi semua sesi di benchmark ini → angka = overhead struktur sesi,
+    # ditambah isi pesan yang unik per sesi pada trafik asli
+    rows = []
+    for name, builder in (("legacy", build_legacy), ("current", build_current)):
+        sessions, used, elapsed = measure(builder, n, k)
+        rows.append((name, used / n, elapsed / n * 1e6))
+        if name == "current":
+            wire = sum(len(encode_session(s)) for s in sessions[:1000]) / min(n, 1000)
+            deep = sum(approx_session_bytes(s) for s in sessions[:1000]) / min(n, 1000)
+        del sessions
+
+    print(f"{n} sesi x {k} exchange")
+    print(f"{'record':<10}{'bytes/sesi':>12}{'us/sesi':>10}")
+    for name, per, us in rows:
+        print(f"{name:<10}{per:>12.0f}{us:>10.1f}")
+    print(f"hemat: {(1 - rows[1][1] / rows[0][1]) * 100:.1f}%")
+    print(f"encode_session (sqlite/snapshot): {wire:.0f} bytes/sesi; "
+          f"approx_session_bytes (batas atas, gauge memory_bytes): {deep:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,7 @@ function bubbleBot(answer, meta){
     </div>`;
   chatLog.appendChild(wrap);
   scrollToBottom();
+  return wrap;
 }
 
 function bubbleTyping(){
@@ -83,6 +84,83 @@ function removeTyping(){
   if (t) t.remove();
 }
 
+async function sendClassic(text){
+  const res = await fetch('/api/chat', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ question: text, session_id: sessionId || '' })
+  });
+  const data = await res.json();
+  removeTyping();
+  setSession(data.session_id);
+  bubbleBot(data.answer || '(jawaban kosong)', {
+    source: data.source, intent: data.intent, has_data: !!data.has_data
+  });
+}
+
+// Streaming (SSE via fetch): token LLM langsung dirender ke bubble, lalu diganti versi final saat event "done"
+// Error dengan fallback=true = request stream belum diterima server (boleh kirim ulang ke /api/chat)
+async function sendStream(text){
+  let res;
+  try {
+    res = await fetch('/api/chat/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+      body: JSON.stringify({ question: text, session_id: sessionId || '' })
+    });
+  } catch (e){
+    throw Object.assign(new Error('stream gagal dimulai'), { fallback: true });
+  }
+  if (!res.ok || !res.body) throw Object.assign(new Error('stream unavailable'), { fallback: true });
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '', answer = '', live = null, pending = false, final = null;
+
+  const render = () => {
+    pending = false;
+    if (!live) return;
+    live.querySelector('.prose').innerHTML = mdToHtml(answer);
+    scrollToBottom();
+  };
+  const handle = (event, data) => {
+    if (event === 'meta'){
+      setSession(data.session_id);
+    } else if (event === 'token'){
+      answer += data.delta || '';
+      if (!live){ removeTyping(); live = bubbleBot('', null); }
+      if (!pending){ pending = true; requestAnimationFrame(render); }
+    } else if (event === 'done'){
+      final = data;
+    }
+  };
+
+  while (true){
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let idx;
+    while ((idx = buf.indexOf('\n\n')) >= 0){
+      const frame = buf.slice(0, idx);
+      buf = buf.slice(idx + 2);
+      let event = 'message', payload = '';
+      for (const line of frame.split('\n')){
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) payload += line.slice(5).trim();
+      }
+      if (payload) handle(event, JSON.parse(payload));
+    }
+  }
+
+  if (!final) throw new Error(live ? 'stream terputus' : 'stream kosong');
+  removeTyping();
+  if (live) live.remove();
+  setSession(final.session_id);
+  bubbleBot(final.answer || '(jawaban kosong)', {
+    source: final.source, intent: final.intent, has_data: !!final.has_data
+  });
+}
+
 async function send(text){
   if (!text.trim()) return;
   bubbleUser(text);
@@ -93,17 +171,13 @@ async function send(text){
   btnSend.disabled = true;
 
   try {
-    const res = await fetch('/api/chat', {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ question: text, session_id: sessionId || '' })
-    });
-    const data = await res.json();
-    removeTyping();
-    setSession(data.session_id);
-    bubbleBot(data.answer || '(jawaban kosong)', {
-      source: data.source, intent: data.intent, has_data: !!data.has_data
-    });
+    try {
+      await sendStream(text);
+    } catch (e){
+      // server sudah menerima request stream → jangan kirim ulang (pertanyaan bisa diproses dua kali)
+      if (!e.fallback) throw e;
+      await sendClassic(text);  // network error / non-2xx (mis. proxy tanpa dukungan stream) → endpoint biasa
+    }
   } catch (e){
     removeTyping();
     bubbleBot('❌ Gagal menghubungi server. Pastikan backend FastAPI berjalan di port yang sama.', { source:'client', intent:'error', has_data:false });